@@ -0,0 +1,154 @@
+import os
+
+import cv2
+import numpy as np
+
+from metrics import NULL_METRICS
+
+# Labels of the Levi-Hassner age_net Caffe model
+DNN_AGE_LIST = ['(0-2)', '(4-6)', '(8-12)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
+
+# FER+ output classes mapped onto the app's emotion names
+FERPLUS_LABELS = ['Neutral', 'Happy', 'Surprise', 'Sad', 'Angry', 'Disgust', 'Fear', 'Disgust']
+
+# Files looked for by load_dnn_backend(): (weights, config or None)
+MODEL_FILES = {
+    'face': ('res10_300x300_ssd_iter_140000.caffemodel', 'deploy.prototxt'),
+    'age': ('age_net.caffemodel', 'age_deploy.prototxt'),
+    'emotion': ('emotion-ferplus-8.onnx', None)
+}
+
+
+def _read_net(model, config=None):
+    if not os.path.isfile(model):
+        raise IOError(f"Model file not found: {model}")
+    if config is not None and not os.path.isfile(config):
+        raise IOError(f"Model config not found: {config}")
+    net = cv2.dnn.readNet(model, config or "")
+    net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+    net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+    return net
+
+
+class DnnFaceDetector:
+    """SSD face detector (e.g. the res10 300x300 Caffe model) run through cv2.dnn
+
+    detect() takes the BGR frame and returns (x, y, w, h) boxes in frame
+    coordinates for detections above `confidence`.
+    """
+
+    def __init__(self, model, config=None, input_size=(300, 300), mean=(104.0, 177.0, 123.0),
+                 confidence=0.5, swap_rb=False):
+        self.net = _read_net(model, config)
+        self.input_size = input_size
+        self.mean = mean
+        self.confidence = confidence
+        self.swap_rb = swap_rb
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(frame, 1.0, self.input_size, self.mean, self.swap_rb, False)
+        self.net.setInput(blob)
+        # SSD output: [1, 1, N, 7] rows of (image, class, confidence, x0, y0, x1, y1)
+        detections = self.net.forward().reshape(-1, 7)
+        detections = detections[detections[:, 2] >= self.confidence]
+
+        boxes = np.clip(detections[:, 3:7], 0.0, 1.0) * np.array([width, height, width, height])
+        faces = []
+        for x0, y0, x1, y1 in boxes.astype(int):
+            if x1 > x0 and y1 > y0:
+                faces.append((int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+        return faces
+
+
+class DnnClassifier:
+    """Image classifier run through cv2.dnn on whole batches of face crops
+
+    classify() packs all crops into one blobFromImages call and runs a
+    single forward pass per max_batch crops, returning one label per crop.
+    grayscale=True feeds single-channel crops (e.g. FER+).
+    """
+
+    def __init__(self, model, config=None, labels=None, input_size=(227, 227), mean=(0.0, 0.0, 0.0),
+                 scale=1.0, swap_rb=False, grayscale=False, max_batch=32):
+        self.net = _read_net(model, config)
+        self.labels = list(labels or [])
+        self.input_size = input_size
+        self.mean = mean
+        self.scale = scale
+        self.swap_rb = swap_rb
+        self.grayscale = grayscale
+        self.max_batch = max_batch
+
+    def classify(self, crops):
+        labels = []
+        for start in range(0, len(crops), self.max_batch):
+            batch = crops[start:start + self.max_batch]
+            blob = cv2.dnn.blobFromImages(batch, self.scale, self.input_size, self.mean, self.swap_rb, False)
+            self.net.setInput(blob)
+            scores = self.net.forward().reshape(len(batch), -1)
+            labels.extend(self.labels[i] if i < len(self.labels) else str(i) for i in scores.argmax(axis=1))
+        return labels
+
+
+class DnnBackend:
+    """cv2.dnn models replacing the Haar detector and/or the heuristic classifiers
+
+    Any of the three parts may be None, in which case FaceAnalyzer keeps its
+    Haar cascade or heuristic for that part.
+    """
+
+    def __init__(self, face_detector=None, age_classifier=None, emotion_classifier=None):
+        self.face_detector = face_detector
+        self.age_classifier = age_classifier
+        self.emotion_classifier = emotion_classifier
+
+    @property
+    def name(self):
+        parts = [part for part, model in (('face', self.face_detector), ('age', self.age_classifier),
+                                          ('emotion', self.emotion_classifier)) if model is not None]
+        return "dnn(" + ",".join(parts) + ")"
+
+    def detect(self, frame):
+        return self.face_detector.detect(frame)
+
+    def classify(self, frame, gray, faces, need_age=True, need_emotion=True, metrics=NULL_METRICS):
+        """Return (ages, emotions) for all faces, None for parts this backend doesn't provide"""
+        ages = emotions = None
+        if need_age and self.age_classifier is not None:
+            with metrics.stage('dnn_age'):
+                crops = [frame[y:y+h, x:x+w] for (x, y, w, h) in faces]
+                ages = self.age_classifier.classify(crops) if crops else []
+        if need_emotion and self.emotion_classifier is not None:
+            with metrics.stage('dnn_emotion'):
+                source = gray if self.emotion_classifier.grayscale else frame
+                crops = [source[y:y+h, x:x+w] for (x, y, w, h) in faces]
+                emotions = self.emotion_classifier.classify(crops) if crops else []
+        return ages, emotions
+
+
+def load_dnn_backend(models_dir, parts=('face', 'age', 'emotion')):
+    """Build a DnnBackend from whichever MODEL_FILES are present in models_dir"""
+    def paths(part):
+        model, config = MODEL_FILES[part]
+        model = os.path.join(models_dir, model)
+        config = os.path.join(models_dir, config) if config else None
+        if not os.path.isfile(model) or (config and not os.path.isfile(config)):
+            return None
+        return model, config
+
+    found = {part: paths(part) for part in parts}
+    if not any(found.values()):
+        expected = ", ".join(f for part in parts for f in MODEL_FILES[part] if f)
+        raise IOError(f"No DNN models found in {models_dir} (expected {expected})")
+
+    face_detector = age_classifier = emotion_classifier = None
+    if found.get('face'):
+        face_detector = DnnFaceDetector(*found['face'])
+    if found.get('age'):
+        age_classifier = DnnClassifier(*found['age'], labels=DNN_AGE_LIST, input_size=(227, 227),
+                                       mean=(78.4263377603, 87.7689143744, 114.895847746))
+    if found.get('emotion'):
+        emotion_classifier = DnnClassifier(*found['emotion'], labels=FERPLUS_LABELS, input_size=(64, 64),
+                                           grayscale=True)
+    return DnnBackend(face_detector, age_classifier, emotion_classifier)
@@ -0,0 +1,93 @@
+# Steady-state memory allocated per analyzed frame, checked against a budget
+#
+#   python benchmarks/bench_allocations.py --budget-kib 64
+#
+# Frames are analyzed through the same calls the apps make (full detection,
+# age only, tracking, downscaled detection). After a warm-up that fills the
+# reusable buffers, tracemalloc records the peak memory allocated while each
+# frame is processed; numpy and OpenCV output arrays are included. Exits with
+# status 1 if any case goes over the budget, so it can gate a change.
+import os
+import sys
+import argparse
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_analyzer import FaceAnalyzer
+from detection import MultiResDetector
+from tracking import FaceTracker
+from synthetic import make_frame
+
+
+def cases():
+    """(name, per-frame step) pairs, each with its own analyzer"""
+    full = FaceAnalyzer()
+    yield "age+emotion", full.detect_faces_age_emotion
+
+    age_only = FaceAnalyzer(emotion_enabled=False)
+    yield "age only", age_only.detect_faces_age_emotion
+
+    staged = FaceAnalyzer(staged_emotion=True)
+    yield "staged emotion", staged.detect_faces_age_emotion
+
+    tracked = FaceAnalyzer()
+    yield "tracking", FaceTracker(tracked, detect_interval=5).update
+
+    scaled = FaceAnalyzer(detector=MultiResDetector(downscale=0.5, sweep_interval=5))
+    yield "detect-scale 0.5", scaled.detect_faces_age_emotion
+
+
+def measure(step, frames, warmup):
+    work = np.empty_like(frames[0])
+    for frame in frames[:warmup]:
+        np.copyto(work, frame)
+        step(work)
+
+    tracemalloc.start()
+    per_frame = []
+    for frame in frames:
+        np.copyto(work, frame)
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step(work)
+        per_frame.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return per_frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check per-frame allocations of the detection hot path")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--faces", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--budget-kib", type=float, default=64.0,
+                        help="maximum mean KiB allocated per frame in steady state")
+    args = parser.parse_args(argv)
+
+    base = make_frame(args.width, args.height, args.faces, seed=3)
+    frames = [np.roll(base, i * 2, axis=1) for i in range(args.frames)]
+    frame_kib = base.nbytes / 1024
+
+    print(f"{args.width}x{args.height}, {args.faces} faces; one BGR frame is {frame_kib:.0f} KiB")
+    print(f"{'case':<18} {'mean KiB/frame':>15} {'max KiB/frame':>14}  budget {args.budget_kib:.0f} KiB")
+    failed = []
+    for name, step in cases():
+        per_frame = np.array(measure(step, frames, args.warmup)) / 1024
+        over = per_frame.mean() > args.budget_kib
+        if over:
+            failed.append(name)
+        print(f"{name:<18} {per_frame.mean():15.1f} {per_frame.max():14.1f}  {'OVER' if over else 'ok'}")
+
+    if failed:
+        print(f"Over budget: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
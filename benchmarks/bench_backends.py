@@ -0,0 +1,114 @@
+# Haar/heuristic backend vs cv2.dnn backend on CPU, plus batched vs per-face DNN classification
+#
+#   python benchmarks/bench_backends.py --models-dir models
+#
+# The DNN side needs the model files listed in backends.MODEL_FILES; without
+# them only the Haar backend is measured.
+import os
+import sys
+import time
+import json
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_analyzer import FaceAnalyzer
+from metrics import StageMetrics
+from synthetic import make_frame, face_boxes
+
+
+def time_backend(analyzer, frames):
+    """Per-frame latencies in ms plus a per-stage breakdown from an instrumented pass"""
+    analyzer.detect_faces_age_emotion(frames[0].copy())
+    latencies = []
+    for frame in frames:
+        work = frame.copy()
+        start = time.perf_counter()
+        analyzer.detect_faces_age_emotion(work)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    analyzer.metrics = StageMetrics(enabled=True, window=len(frames))
+    for frame in frames:
+        analyzer.detect_faces_age_emotion(frame.copy())
+    stages = {name: entry['total_ms'] / len(frames) for name, entry in analyzer.metrics.summary().items()}
+    analyzer.metrics = StageMetrics(enabled=False)
+
+    ms = np.array(latencies)
+    return {'fps': float(1000.0 / ms.mean()), 'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)), 'stages_ms': stages}
+
+
+def time_batching(classifier, crops, repeats):
+    """Median ms to classify all crops one forward pass per face vs one batched pass"""
+    per_face, batched = [], []
+    classifier.classify(crops)
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for crop in crops:
+            classifier.classify([crop])
+        per_face.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        classifier.classify(crops)
+        batched.append(time.perf_counter() - start)
+    return float(np.median(per_face)) * 1000.0, float(np.median(batched)) * 1000.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Haar and cv2.dnn backends on CPU")
+    parser.add_argument("--models-dir", default="models", help="directory holding the DNN model files")
+    parser.add_argument("--faces", default="1,4,10", help="comma separated face counts")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--cv-threads", type=int, default=1, help="cv2.setNumThreads value")
+    parser.add_argument("--json", help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    cv2.setNumThreads(args.cv_threads)
+    backends = {'haar': None}
+    try:
+        from backends import load_dnn_backend
+        backends['dnn'] = load_dnn_backend(args.models_dir)
+    except (IOError, cv2.error) as e:
+        print(f"Skipping dnn backend: {e}", file=sys.stderr)
+
+    results = []
+    print(f"{'backend':<8} {'faces':>5} {'fps':>8} {'p50':>8} {'p95':>8}  stages (ms)")
+    for faces in [int(n) for n in args.faces.split(",")]:
+        base = make_frame(args.width, args.height, faces, seed=faces)
+        frames = [np.roll(base, i * 4, axis=1) for i in range(args.frames)]
+        for name, backend in backends.items():
+            result = time_backend(FaceAnalyzer(backend=backend), frames)
+            result.update({'backend': name, 'faces': faces, 'width': args.width, 'height': args.height})
+            results.append(result)
+            stages = " ".join(f"{k}={v:.1f}" for k, v in result['stages_ms'].items())
+            print(f"{name:<8} {faces:>5} {result['fps']:8.1f} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f}  {stages}")
+
+        # One forward pass per face vs one blobFromImages pass for the whole frame
+        backend = backends.get('dnn')
+        if backend is None or faces == 0:
+            continue
+        gray = cv2.cvtColor(base, cv2.COLOR_BGR2GRAY)
+        boxes = [(max(0, x), max(0, y), w, h) for (x, y, w, h) in face_boxes(args.width, args.height, faces)]
+        for part, classifier in (('age', backend.age_classifier), ('emotion', backend.emotion_classifier)):
+            if classifier is None:
+                continue
+            source = gray if classifier.grayscale else base
+            crops = [source[y:y+h, x:x+w] for (x, y, w, h) in boxes]
+            per_face, batched = time_batching(classifier, crops, args.repeats)
+            results.append({'backend': 'dnn', 'faces': faces, 'classifier': part,
+                            'per_face_ms': per_face, 'batched_ms': batched})
+            print(f"  dnn {part:<8} {faces:>2} faces: per-face {per_face:7.2f} ms, "
+                  f"batched {batched:7.2f} ms ({per_face / batched:.1f}x)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Display path cost: the original per-frame conversion vs display.DisplayBuffer
+#
+# Reports bytes allocated per frame (tracemalloc) and time per frame. The
+# PhotoImage step is included when a Tk display is available; otherwise only
+# the numpy/PIL part is measured.
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import cv2
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from display import DisplayBuffer
+from synthetic import make_frame
+
+
+def legacy_display(frame, label):
+    """The display path update_frame used before DisplayBuffer"""
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    height, width = frame_rgb.shape[:2]
+    max_width, max_height = 700, 500
+    if width > max_width or height > max_height:
+        scale = min(max_width/width, max_height/height)
+        frame_rgb = cv2.resize(frame_rgb, (int(width * scale), int(height * scale)))
+    pil_image = Image.fromarray(frame_rgb)
+    if label is not None:
+        from PIL import ImageTk
+        photo = ImageTk.PhotoImage(pil_image)
+        label.config(image=photo)
+        label.image = photo
+
+
+def measure(step, frames):
+    # Warm up so one-off buffer allocation isn't counted as steady state
+    for frame in frames[:3]:
+        step(frame)
+
+    # Peak traced memory above the starting point, per frame
+    tracemalloc.start()
+    allocated = 0
+    for frame in frames:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step(frame)
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for frame in frames:
+        step(frame)
+    elapsed = time.perf_counter() - start
+    return allocated / len(frames), elapsed * 1000.0 / len(frames)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Tk display conversion path")
+    parser.add_argument("--frames", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    label = None
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        label = tk.Label(root)
+        label.pack()
+    except Exception:
+        print("No Tk display available: measuring resize/convert/PIL only")
+
+    print(f"{'size':<10} {'path':<8} {'KiB alloc/frame':>16} {'ms/frame':>10}")
+    for width, height in [(640, 480), (1280, 720), (1920, 1080)]:
+        frames = [make_frame(width, height, 2, seed=i) for i in range(4)] * (args.frames // 4)
+        display = DisplayBuffer()
+
+        def new_path(frame, display=display):
+            if label is not None:
+                display.show(label, frame)
+            else:
+                display.prepare(frame)
+
+        for name, step in (("legacy", lambda f: legacy_display(f, label)), ("buffer", new_path)):
+            per_frame_bytes, per_frame_ms = measure(step, frames)
+            print(f"{width}x{height:<5} {name:<8} {per_frame_bytes / 1024:16.1f} {per_frame_ms:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
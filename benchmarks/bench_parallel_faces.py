@@ -0,0 +1,93 @@
+# Per-face fan-out scaling: serial analysis vs FaceExecutor pools by face count
+#
+# Also checks that pooled and inline analysis agree: every config's
+# detections must match the serial run's on the same frames (exits 1 if not).
+import os
+import sys
+import time
+import json
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_analyzer import FaceAnalyzer
+from parallel import FaceExecutor
+from synthetic import make_frame
+
+
+def time_frame(analyzer, frame, repeats):
+    """Median seconds per detect_faces_age_emotion call"""
+    # Warm up (pool start-up, lazy allocations)
+    analyzer.detect_faces_age_emotion(frame.copy())
+    times = []
+    for _ in range(repeats):
+        work = frame.copy()
+        start = time.perf_counter()
+        analyzer.detect_faces_age_emotion(work)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per-face parallel analysis")
+    parser.add_argument("--faces", default="1,4,10,16,24", help="comma separated face counts")
+    parser.add_argument("--workers", default="2,4", help="comma separated pool sizes")
+    parser.add_argument("--kinds", default="process,thread", help="executor kinds to compare")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--json", help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    face_counts = [int(n) for n in args.faces.split(",")]
+    frames = {n: make_frame(args.width, args.height, n, seed=n) for n in face_counts}
+
+    configs = [("serial", None)]
+    for kind in args.kinds.split(","):
+        for workers in args.workers.split(","):
+            configs.append((f"{kind}x{workers}", (kind, int(workers))))
+
+    results = []
+    labels = {}
+    for name, config in configs:
+        executor = None
+        if config is not None:
+            # min_faces=1 so the pool is exercised even for single faces
+            executor = FaceExecutor(workers=config[1], kind=config[0], min_faces=1)
+        analyzer = FaceAnalyzer(executor=executor)
+        try:
+            for n in face_counts:
+                seconds = time_frame(analyzer, frames[n], args.repeats)
+                labels[name, n] = analyzer.analyze(frames[n])
+                results.append({'config': name, 'faces': n, 'ms_per_frame': seconds * 1000.0})
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    # Table: one row per config, one column per face count, plus speedup vs serial
+    serial = {r['faces']: r['ms_per_frame'] for r in results if r['config'] == 'serial'}
+    print(f"{args.width}x{args.height}, median ms/frame (speedup vs serial)")
+    print(f"{'config':<12}" + "".join(f"{str(n) + ' faces':>20}" for n in face_counts))
+    for name, _ in configs:
+        row = f"{name:<12}"
+        for n in face_counts:
+            ms = next(r['ms_per_frame'] for r in results if r['config'] == name and r['faces'] == n)
+            row += f"{ms:>12.1f} ({serial[n] / ms:4.2f}x)"
+        print(row)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'width': args.width, 'height': args.height, 'results': results}, f, indent=2)
+
+    # Pooled faces are cropped from the same untouched frame as inline ones, so labels must not differ
+    mismatched = [(name, n) for name, _ in configs for n in face_counts
+                  if labels[name, n] != labels['serial', n]]
+    for name, n in mismatched:
+        print(f"{name}: labels differ from serial with {n} faces", file=sys.stderr)
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
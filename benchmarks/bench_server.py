@@ -0,0 +1,129 @@
+# Load generator for server.py: requests/sec and tail latency over keep-alive connections
+#
+#   python benchmarks/bench_server.py                      # starts a server on a temporary Unix socket
+#   python benchmarks/bench_server.py --url http://127.0.0.1:8080 --clients 8 --requests 200
+#
+# Each client thread holds one keep-alive connection and posts JPEG-encoded
+# synthetic frames back to back. Latency is measured per request on the
+# client, from sending the body to reading the full response.
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from server import connect
+from synthetic import make_frame
+
+
+def make_payloads(width, height, faces, count=8):
+    """A few different JPEG frames so the server can't get lucky on one image"""
+    payloads = []
+    for seed in range(count):
+        ok, data = cv2.imencode(".jpg", make_frame(width, height, faces, seed=seed))
+        if not ok:
+            raise IOError("Could not encode test frame")
+        payloads.append(data.tobytes())
+    return payloads
+
+
+def client(address, payloads, requests, latencies, errors, batch_sizes):
+    conn = connect(address)
+    try:
+        for i in range(requests):
+            body = payloads[i % len(payloads)]
+            start = time.perf_counter()
+            conn.request("POST", "/analyze", body=body, headers={"Content-Type": "image/jpeg"})
+            response = conn.getresponse()
+            data = response.read()
+            elapsed = time.perf_counter() - start
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+            latencies.append(elapsed)
+            batch_sizes.append(json.loads(data)['batch_size'])
+    finally:
+        conn.close()
+
+
+def start_server(socket_path, args):
+    command = [sys.executable, os.path.join(os.path.dirname(BENCH_DIR), "server.py"), "--unix", socket_path,
+               "--workers", str(args.workers), "--max-batch", str(args.max_batch)]
+    process = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30.0
+    while time.time() < deadline:
+        if os.path.exists(socket_path):
+            try:
+                conn = connect(socket_path, timeout=5.0)
+                conn.request("GET", "/health")
+                conn.getresponse().read()
+                conn.close()
+                return process
+            except OSError:
+                pass
+        time.sleep(0.1)
+    process.kill()
+    raise IOError("Server did not start")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the local inference server")
+    parser.add_argument("--url", help="http://host:port of a running server")
+    parser.add_argument("--unix", help="Unix socket path of a running server")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent keep-alive connections")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--faces", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="workers for the server started when no --url/--unix is given")
+    parser.add_argument("--max-batch", type=int, default=8, help="as for server.py")
+    args = parser.parse_args(argv)
+
+    process = None
+    address = args.url or args.unix
+    if address is None:
+        address = os.path.join(tempfile.mkdtemp(), "server.sock")
+        process = start_server(address, args)
+
+    payloads = make_payloads(args.width, args.height, args.faces)
+    latencies, errors, batch_sizes = [], [], []
+    threads = [threading.Thread(target=client, args=(address, payloads, args.requests, latencies, errors,
+                                                     batch_sizes))
+               for _ in range(args.clients)]
+    try:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if not latencies:
+        print(f"No successful requests ({len(errors)} errors)", file=sys.stderr)
+        return 1
+    ms = np.array(latencies) * 1000.0
+    print(f"{args.clients} clients x {args.requests} requests, {args.width}x{args.height} JPEG, "
+          f"{args.faces} faces, against {address}")
+    print(f"  {len(latencies) / elapsed:.1f} req/s, {len(errors)} errors, "
+          f"mean batch {np.mean(batch_sizes):.2f}")
+    print(f"  latency ms: mean {ms.mean():.1f}  p50 {np.percentile(ms, 50):.1f}  "
+          f"p95 {np.percentile(ms, 95):.1f}  p99 {np.percentile(ms, 99):.1f}  max {ms.max():.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
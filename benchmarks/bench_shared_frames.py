@@ -0,0 +1,193 @@
+# Frame hand-off to analysis processes: multiprocessing.Queue (pickled) vs the shared-memory ring
+#
+#   python benchmarks/bench_shared_frames.py                       # 1080p, transfer only
+#   python benchmarks/bench_shared_frames.py --analyze --workers 2 # with face analysis in the workers
+#   python benchmarks/bench_shared_frames.py --fps 0               # producer as fast as it can
+#
+# The producer stands in for the capture thread of the Tk process: it
+# offers pre-generated synthetic frames at --fps and never waits for the
+# workers (a full queue or ring drops the frame, as a live camera would).
+# Reported per mode: frames delivered per second, producer CPU time per
+# delivered frame (what the hand-off costs the UI process), and hand-off latency
+# from offering a frame to a worker holding it as an ndarray.
+import os
+import sys
+import time
+import queue
+import argparse
+import multiprocessing
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from sharedframes import SharedFrameRing
+from synthetic import make_frame
+
+
+def make_analyze(analyze):
+    if not analyze:
+        # Touch a sparse grid of the frame so the worker really reads it
+        return lambda frame: int(frame[::16, ::16].sum())
+    from face_analyzer import FaceAnalyzer
+    analyzer = FaceAnalyzer()
+    analyzer.annotate = False
+    return lambda frame: len(analyzer.analyze(frame))
+
+
+def queue_worker(frames, results, analyze):
+    work = make_analyze(analyze)
+    results.put(None)
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        sequence, sent_at, frame = item
+        received_at = time.perf_counter()
+        work(frame)
+        results.put((sequence, sent_at, received_at, time.perf_counter()))
+
+
+def ring_worker(ring, results, analyze):
+    work = make_analyze(analyze)
+    results.put(None)
+    try:
+        while ring.running:
+            taken = ring.take(timeout=0.1)
+            if taken is None:
+                continue
+            sequence, sent_at, slot, frame = taken
+            received_at = time.perf_counter()
+            work(frame)
+            ring.release(slot)
+            results.put((sequence, sent_at, received_at, time.perf_counter()))
+    finally:
+        ring.close()
+
+
+def wait_ready(results, workers):
+    for _ in range(workers):
+        results.get(timeout=60.0)
+
+
+def drain(results, records, idle=1.0):
+    """Collect result records until none arrive for idle seconds"""
+    while True:
+        try:
+            records.append(results.get(timeout=idle))
+        except queue.Empty:
+            return
+
+
+def produce(frames, count, fps, offer):
+    """Offer count frames at fps (0 = flat out); returns how many were dropped"""
+    interval = 1.0 / fps if fps else 0.0
+    dropped = 0
+    next_frame = time.perf_counter()
+    for sequence in range(1, count + 1):
+        if interval:
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_frame += interval
+        if not offer(sequence, frames[sequence % len(frames)]):
+            dropped += 1
+    return dropped
+
+
+def run_queue(context, frames, args):
+    # Deep enough to absorb jitter, like the ring's spare slots
+    transfer = context.Queue(maxsize=2 * args.workers + 2)
+    results = context.Queue()
+    workers = [context.Process(target=queue_worker, args=(transfer, results, args.analyze), daemon=True)
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    wait_ready(results, args.workers)
+
+    def offer(sequence, frame):
+        try:
+            transfer.put_nowait((sequence, time.perf_counter(), frame))
+        except queue.Full:
+            return False
+        return True
+
+    # CPU time includes the queue's feeder thread, which pickles frames after put_nowait returns
+    start, cpu = time.perf_counter(), time.process_time()
+    dropped = produce(frames, args.frames, args.fps, offer)
+    records = []
+    drain(results, records)
+    cpu = time.process_time() - cpu
+    for _ in workers:
+        transfer.put(None)
+    for worker in workers:
+        worker.join()
+    return start, cpu, dropped, records
+
+
+def run_ring(context, frames, args):
+    ring = SharedFrameRing(frames[0].shape, slots=2 * args.workers + 2, context=context)
+    results = context.Queue()
+    workers = [context.Process(target=ring_worker, args=(ring, results, args.analyze), daemon=True)
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    wait_ready(results, args.workers)
+
+    # The ring numbers frames itself
+    def offer(_sequence, frame):
+        return ring.write(frame) is not None
+
+    start, cpu = time.perf_counter(), time.process_time()
+    produce(frames, args.frames, args.fps, offer)
+    records = []
+    drain(results, records)
+    cpu = time.process_time() - cpu
+    ring.stop()
+    for worker in workers:
+        worker.join()
+    # The ring also counts frames overwritten before a worker took them
+    dropped = args.frames - len(records)
+    ring.close()
+    ring.unlink()
+    return start, cpu, dropped, records
+
+
+def report(name, start, cpu, dropped, records, args):
+    if not records:
+        print(f"{name:>6}: no frames delivered ({dropped} dropped)")
+        return
+    handoff = np.array([received - sent for _, sent, received, _ in records]) * 1000.0
+    elapsed = max(done for _, _, _, done in records) - start
+    print(f"{name:>6}: {len(records) / elapsed:6.1f} frames/s delivered, {len(records)} of {args.frames} "
+          f"({dropped} dropped), producer CPU {cpu * 1000.0 / len(records):.2f} ms/delivered frame, "
+          f"hand-off ms mean {handoff.mean():.2f} p95 {np.percentile(handoff, 95):.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Queue and shared-memory frame transfer to worker processes")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--faces", type=int, default=2)
+    parser.add_argument("--frames", type=int, default=300, help="frames offered per mode")
+    parser.add_argument("--fps", type=float, default=30.0, help="rate frames are offered at (0 = as fast as possible)")
+    parser.add_argument("--workers", type=int, default=1, help="analysis processes")
+    parser.add_argument("--analyze", action="store_true", help="run face analysis in the workers, not just a read")
+    parser.add_argument("--mode", choices=("both", "queue", "shared"), default="both")
+    args = parser.parse_args(argv)
+
+    context = multiprocessing.get_context("spawn")
+    frames = [make_frame(args.width, args.height, args.faces, seed=seed) for seed in range(4)]
+    print(f"{args.frames} frames of {args.width}x{args.height} at "
+          f"{f'{args.fps:g} fps' if args.fps else 'full speed'}, {args.workers} workers, "
+          f"{'face analysis' if args.analyze else 'transfer only'}")
+    if args.mode in ("both", "queue"):
+        report("queue", *run_queue(context, frames, args), args)
+    if args.mode in ("both", "shared"):
+        report("shared", *run_ring(context, frames, args), args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
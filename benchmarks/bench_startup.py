@@ -0,0 +1,112 @@
+# Time-to-first-frame: sequential startup vs camera open and model loading in the background
+#
+#   python benchmarks/bench_startup.py --runs 5
+#
+# Every run is a fresh interpreter, so import and cascade-loading costs are
+# measured the way a user launching the app sees them. A synthetic video file
+# stands in for the camera unless --source is given.
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import threading
+import subprocess
+
+START = time.perf_counter()
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+MODES = ['sequential', 'background']
+
+
+def child(mode, source, emotion):
+    """Run one startup in this process and print its phase timings as JSON"""
+    import cv2
+    from face_analyzer import FaceAnalyzer
+    timings = {'import_ms': (time.perf_counter() - START) * 1000.0}
+    state = {}
+
+    def open_camera():
+        start = time.perf_counter()
+        state['cap'] = cv2.VideoCapture(int(source) if source.isdigit() else source)
+        timings['open_ms'] = (time.perf_counter() - start) * 1000.0
+
+    def load_models():
+        start = time.perf_counter()
+        state['analyzer'] = FaceAnalyzer(emotion_enabled=emotion)
+        timings['models_ms'] = (time.perf_counter() - start) * 1000.0
+
+    if mode == 'sequential':
+        open_camera()
+        load_models()
+    else:
+        threads = [threading.Thread(target=open_camera), threading.Thread(target=load_models)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    ret, frame = state['cap'].read()
+    if not ret:
+        raise IOError(f"Could not read from {source}")
+    state['analyzer'].detect_faces_age_emotion(frame)
+    timings['first_frame_ms'] = (time.perf_counter() - START) * 1000.0
+    state['cap'].release()
+    print(json.dumps(timings))
+
+
+def make_source(path):
+    import cv2
+    import numpy as np
+    from synthetic import make_frame
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (640, 480))
+    frame = make_frame(640, 480, 2, seed=1)
+    for i in range(5):
+        writer.write(np.roll(frame, i * 4, axis=1))
+    writer.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure time-to-first-frame for the startup strategies")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreter runs per case")
+    parser.add_argument("--source", help="camera index or video file (default: a generated video)")
+    parser.add_argument("--json", help="also write results to this JSON file")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--emotion", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.source, bool(args.emotion))
+        return 0
+
+    source = args.source
+    if source is None:
+        source = os.path.join(tempfile.mkdtemp(), "startup.avi")
+        make_source(source)
+
+    results = []
+    print(f"{'mode':<11} {'emotion':>7} {'import':>8} {'open':>8} {'models':>8} {'first frame':>12}  (median ms)")
+    for mode in MODES:
+        for emotion in (1, 0):
+            runs = []
+            for _ in range(args.runs):
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode,
+                                         "--source", source, "--emotion", str(emotion)],
+                                        capture_output=True, text=True, check=True).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            median = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+            results.append({'mode': mode, 'emotion': bool(emotion), 'runs': runs, 'median': median})
+            print(f"{mode:<11} {'on' if emotion else 'off':>7} {median['import_ms']:8.1f} {median['open_ms']:8.1f} "
+                  f"{median['models_ms']:8.1f} {median['first_frame_ms']:12.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
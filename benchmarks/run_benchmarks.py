@@ -0,0 +1,162 @@
+# Reproducible throughput/latency benchmarks for the detection hot paths
+#
+#   python benchmarks/run_benchmarks.py --output results.json
+#   python benchmarks/run_benchmarks.py --compare results.json
+#
+# Frames are synthetic and seeded, so two runs on the same machine see
+# exactly the same pixels; no camera or display is needed.
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_analyzer import FaceAnalyzer
+from metrics import StageMetrics
+from synthetic import make_frame
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+FACE_COUNTS = [0, 1, 4, 10]
+
+# Headless equivalents of the two apps' per-frame detection calls
+SCENARIOS = {
+    # main.py: detect_faces_age_emotion with age and emotion enabled
+    'main': FaceAnalyzer,
+    # opencam.py: detect_faces_and_age, i.e. age only
+    'opencam': lambda: FaceAnalyzer(emotion_enabled=False, label_scale=0.8),
+}
+
+
+def build_corpus(width, height, faces, frames):
+    """Deterministic frames: one synthetic scene, shifted a little each frame"""
+    base = make_frame(width, height, faces, seed=faces * 7919 + width)
+    step = max(1, width // 320)
+    return [np.roll(base, i * step, axis=1) for i in range(frames)]
+
+
+def run_case(scenario, width, height, faces, frames, warmup):
+    analyzer = SCENARIOS[scenario]()
+    corpus = build_corpus(width, height, faces, frames)
+
+    for frame in corpus[:warmup]:
+        analyzer.detect_faces_age_emotion(frame.copy())
+
+    # End-to-end latency per frame (copy made outside the timed region)
+    latencies = []
+    for frame in corpus:
+        work = frame.copy()
+        start = time.perf_counter()
+        analyzer.detect_faces_age_emotion(work)
+        latencies.append(time.perf_counter() - start)
+
+    # Per-stage breakdown in a separate, instrumented pass so the hooks don't perturb the timings above
+    analyzer.metrics = StageMetrics(enabled=True, window=frames)
+    for frame in corpus:
+        analyzer.detect_faces_age_emotion(frame.copy())
+    stages = {name: entry['total_ms'] / frames for name, entry in analyzer.metrics.summary().items()}
+
+    ms = np.array(latencies) * 1000.0
+    return {
+        'scenario': scenario,
+        'width': width,
+        'height': height,
+        'faces': faces,
+        'frames': frames,
+        'fps': float(frames / np.sum(latencies)),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'stages_ms': stages
+    }
+
+
+def case_key(result):
+    return (result['scenario'], result['width'], result['height'], result['faces'])
+
+
+def compare(results, baseline, tolerance):
+    """Print p50/fps deltas against a previous run; return the regressed cases"""
+    previous = {case_key(r): r for r in baseline['results']}
+    regressions = []
+    print(f"\nComparison against baseline (tolerance {tolerance:.0%})")
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+        change = result['p50_ms'] / old['p50_ms'] - 1.0 if old['p50_ms'] > 0 else 0.0
+        flag = "REGRESSION" if change > tolerance else ""
+        print(f"{result['scenario']:<8} {result['width']}x{result['height']:<5} {result['faces']:>2} faces  "
+              f"p50 {old['p50_ms']:7.2f} -> {result['p50_ms']:7.2f} ms ({change:+.1%})  {flag}")
+        if flag:
+            regressions.append(case_key(result))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark face/age/emotion detection on synthetic frames")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated scenarios")
+    parser.add_argument("--resolutions", default=",".join(f"{w}x{h}" for w, h in RESOLUTIONS))
+    parser.add_argument("--faces", default=",".join(str(n) for n in FACE_COUNTS))
+    parser.add_argument("--frames", type=int, default=30, help="timed frames per case")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--cv-threads", type=int, default=1,
+                        help="cv2.setNumThreads value (1 keeps runs comparable across machines)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="p50 slowdown above which a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    cv2.setNumThreads(args.cv_threads)
+    resolutions = [tuple(int(v) for v in r.split("x")) for r in args.resolutions.split(",")]
+    face_counts = [int(n) for n in args.faces.split(",")]
+
+    results = []
+    print(f"{'scenario':<8} {'size':<10} {'faces':>5} {'fps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  stages (ms)")
+    for scenario in args.scenarios.split(","):
+        for width, height in resolutions:
+            for faces in face_counts:
+                result = run_case(scenario, width, height, faces, args.frames, args.warmup)
+                results.append(result)
+                stages = " ".join(f"{k}={v:.1f}" for k, v in result['stages_ms'].items())
+                print(f"{scenario:<8} {width}x{height:<5} {faces:>5} {result['fps']:8.1f} "
+                      f"{result['p50_ms']:8.2f} {result['p95_ms']:8.2f} {result['p99_ms']:8.2f}  {stages}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'cv_threads': args.cv_threads,
+            'frames': args.frames
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
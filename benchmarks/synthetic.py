@@ -0,0 +1,52 @@
+# Deterministic synthetic frames with cartoon faces the Haar cascade picks up
+import cv2
+import numpy as np
+
+
+def draw_face(img, cx, cy, r, tone=170):
+    """Draw a blurred-friendly cartoon face centred at (cx, cy) with radius r"""
+    cv2.ellipse(img, (cx, cy), (int(r * 0.75), r), 0, 0, 360, (tone, tone, tone), -1)
+
+    # Dark eyes and brows give the Haar features their contrast
+    for dx in (-0.33, 0.33):
+        cv2.ellipse(img, (int(cx + dx * r), int(cy - 0.2 * r)), (int(r * 0.2), int(r * 0.12)),
+                    0, 0, 360, (40, 40, 40), -1)
+        cv2.ellipse(img, (int(cx + dx * r), int(cy - 0.42 * r)), (int(r * 0.22), int(r * 0.05)),
+                    0, 0, 360, (60, 60, 60), -1)
+
+    # Bright nose bridge and dark mouth
+    cv2.ellipse(img, (cx, int(cy + 0.15 * r)), (int(r * 0.08), int(r * 0.15)), 0, 0, 360, (200, 200, 200), -1)
+    cv2.ellipse(img, (cx, int(cy + 0.5 * r)), (int(r * 0.3), int(r * 0.08)), 0, 0, 360, (70, 70, 70), -1)
+
+
+def _layout(width, height, num_faces):
+    """Yield (cx, cy, r) for num_faces faces laid out on a grid"""
+    if num_faces <= 0:
+        return
+    cols = int(np.ceil(np.sqrt(num_faces * width / height)))
+    rows = int(np.ceil(num_faces / cols))
+    cell_w, cell_h = width // cols, height // rows
+    r = int(min(cell_w / 1.6, cell_h / 2.2) * 0.9)
+    for i in range(num_faces):
+        row, col = divmod(i, cols)
+        yield col * cell_w + cell_w // 2, row * cell_h + cell_h // 2, r
+
+
+def make_frame(width, height, num_faces, seed=0):
+    """Build a BGR frame with num_faces faces laid out on a grid"""
+    rng = np.random.default_rng(seed)
+    frame = np.full((height, width, 3), 90, np.uint8)
+
+    # Mild texture so the background isn't perfectly flat
+    noise = rng.integers(0, 12, size=(height // 8 + 1, width // 8 + 1), dtype=np.uint8)
+    frame += cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)[:, :, None]
+
+    for cx, cy, r in _layout(width, height, num_faces):
+        draw_face(frame, cx, cy, r, tone=int(rng.integers(150, 200)))
+
+    return cv2.GaussianBlur(frame, (0, 0), max(1.0, width / 640))
+
+
+def face_boxes(width, height, num_faces):
+    """Bounding boxes (x, y, w, h) matching the faces drawn by make_frame"""
+    return [(cx - r, cy - r, 2 * r, 2 * r) for cx, cy, r in _layout(width, height, num_faces)]
@@ -0,0 +1,41 @@
+import math
+import threading
+
+import numpy as np
+
+
+class BufferPool:
+    """Named scratch arrays reused from frame to frame
+
+    get(name, shape) returns a C-contiguous view of the first prod(shape)
+    elements of a flat array kept under that name, so it can be handed to
+    OpenCV as a dst buffer. The flat array only grows: it is reallocated
+    when a larger size (a higher resolution, a bigger face) is requested,
+    after which frames of that size and smaller allocate nothing new.
+
+    Buffers are per thread, so an analyzer shared with a thread pool never
+    hands the same scratch memory to two threads. A buffer is only valid
+    until the next get() of the same name on the same thread; callers that
+    keep data across frames use separate names.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {'allocations': 0, 'bytes': 0}
+
+    def get(self, name, shape, dtype=np.uint8):
+        buffers = self.local.__dict__
+        size = math.prod(shape)
+        flat = buffers.get(name)
+        if flat is None or flat.dtype != dtype or flat.size < size:
+            flat = np.empty(size, dtype=dtype)
+            buffers[name] = flat
+            with self.lock:
+                self.stats['allocations'] += 1
+                self.stats['bytes'] += flat.nbytes
+        return flat[:size].reshape(shape)
+
+    def nbytes(self):
+        """Bytes held by the calling thread's buffers"""
+        return sum(flat.nbytes for flat in self.local.__dict__.values())
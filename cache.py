@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def face_hash(face_gray, hash_size=8):
+    """Difference hash of a grayscale face crop as a Python int
+
+    The crop is shrunk to (hash_size + 1) x hash_size and each bit records
+    whether a pixel is brighter than its right-hand neighbour, so small
+    shifts, noise and global brightness changes map to the same key.
+    """
+    small = cv2.resize(face_gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class FaceCache:
+    """Bounded LRU cache of per-face (age, emotion) results keyed by a perceptual hash
+
+    Keys combine the crop's difference hash, a coarse size bucket (the
+    heuristics depend on face size) and a context tuple describing what was
+    estimated, so toggling age/emotion never returns stale labels. Entries
+    older than ttl seconds count as expired and are recomputed; the least
+    recently used entry is evicted once max_entries is reached.
+    """
+
+    def __init__(self, max_entries=512, ttl=2.0, hash_size=8):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hash_size = hash_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    def key(self, face_gray, context=()):
+        size_bucket = max(face_gray.shape[:2]).bit_length()
+        return face_hash(face_gray, self.hash_size), size_bucket, context
+
+    def get(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            stored_at, value = entry
+            if self.ttl and now - stored_at > self.ttl:
+                del self.entries[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key, value, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.entries[key] = (now, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def analyze(self, gray, faces, compute, context=()):
+        """Return estimates for all faces, calling compute(missing_faces) only for uncached ones"""
+        now = time.monotonic()
+        keys = []
+        estimates = []
+        missing = []
+        for index, (x, y, w, h) in enumerate(faces):
+            face_gray = gray[y:y+h, x:x+w]
+            key = self.key(face_gray, context) if face_gray.size else None
+            value = self.get(key, now) if key is not None else None
+            keys.append(key)
+            estimates.append(value)
+            if value is None:
+                missing.append(index)
+
+        if missing:
+            computed = compute([faces[i] for i in missing])
+            for index, value in zip(missing, computed):
+                value = tuple(value)
+                estimates[index] = value
+                if keys[index] is not None:
+                    self.put(keys[index], value, now)
+        return estimates
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def summary(self):
+        summary = dict(self.stats)
+        summary['entries'] = len(self.entries)
+        summary['hit_rate'] = self.hit_rate()
+        return summary
@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from render import OverlayRenderer
+
+
+class CaptureWriter:
+    """Encode and write captured frames on a background thread
+
+    submit() never blocks the caller: frames go onto a bounded queue and a
+    writer thread does the JPEG encoding and disk write. When the queue is
+    full the capture is dropped and counted rather than stalling the UI.
+    Filenames carry millisecond timestamps plus a sequence number, so
+    bursts never collide. With a renderer (render.OverlayRenderer) the
+    detections are drawn onto the frame on the writer thread as well, so
+    callers can submit raw frames.
+    """
+
+    def __init__(self, directory="captures", max_pending=32, jpeg_quality=95, prefix="photo", renderer=None):
+        self.directory = directory
+        self.renderer = renderer
+        self.jpeg_quality = jpeg_quality
+        self.prefix = prefix
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.sequence = 0
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'errors': 0}
+        self.last_saved = None
+        self.last_error = None
+
+        self.thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+        self.thread.start()
+
+    def next_filename(self):
+        self.sequence += 1
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        return os.path.join(self.directory, f"{self.prefix}_{timestamp}_{self.sequence:04d}.jpg")
+
+    def submit(self, frame, detections=None):
+        """Queue a frame for writing; returns its filename, or None if it was dropped
+
+        The writer takes ownership of frame, so pass a copy if the caller
+        reuses the buffer.
+        """
+        filename = self.next_filename()
+        try:
+            self.queue.put_nowait((filename, frame, detections))
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return None
+        self.stats['queued'] += 1
+        return filename
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            filename, frame, detections = item
+            try:
+                os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+                if self.renderer is not None and detections:
+                    self.renderer.draw(frame, detections)
+                if not cv2.imwrite(filename, frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]):
+                    raise IOError(f"Could not write {filename}")
+                self.stats['written'] += 1
+                self.last_saved = (filename, detections)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.last_error = str(e)
+            finally:
+                self.queue.task_done()
+
+    def close(self, timeout=5.0):
+        """Write whatever is still queued, then stop the writer thread"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+
+class VideoRecorder:
+    """Record frames to rotating video segments on a dedicated encoder thread
+
+    submit() copies the frame into a recycled buffer and queues it; the
+    encoder thread runs cv2.VideoWriter.write, so the UI thread never waits
+    on encoding or disk I/O. The queue holds at most max_pending frames:
+    when the encoder falls behind, the oldest queued frame is dropped (and
+    counted) so the recording keeps up with the live feed instead of
+    lagging further and further behind.
+
+    A new segment starts every segment_seconds of recorded video (and when
+    the frame size changes). Next to each segment a JSON lines file holds
+    one record per written frame (timestamp and detections), so raw
+    recordings can have their overlays drawn later with render_recording().
+    With a renderer the overlays are drawn on the encoder thread instead.
+    """
+
+    def __init__(self, directory="recordings", fps=20.0, codec="MJPG", extension=".avi",
+                 segment_seconds=300.0, max_pending=64, prefix="recording", renderer=None):
+        if len(codec) != 4:
+            raise ValueError(f"Codec must be a four-character code, got {codec!r}")
+        self.directory = directory
+        self.fps = fps
+        self.codec = codec
+        self.fourcc = cv2.VideoWriter_fourcc(*codec)
+        self.extension = extension
+        self.segment_frames = max(1, int(round(segment_seconds * fps))) if segment_seconds else None
+        self.max_pending = max_pending
+        self.prefix = prefix
+        self.renderer = renderer
+
+        self.frames = deque()
+        self.free = []
+        self.condition = threading.Condition()
+        self.running = True
+
+        self.writer = None
+        self.records = None
+        self.size = None
+        self.segment_path = None
+        self.segment_written = 0
+        self.segments = []
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'segments': 0, 'errors': 0}
+        self.last_error = None
+
+        self.thread = threading.Thread(target=self._run, name="video-recorder", daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, detections=None, timestamp=None):
+        """Queue a copy of frame; drops the oldest queued frame when the encoder is behind"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.condition:
+            buffer = None
+            while self.free and buffer is None:
+                candidate = self.free.pop()
+                if candidate.shape == frame.shape:
+                    buffer = candidate
+        if buffer is None:
+            buffer = np.empty_like(frame)
+        np.copyto(buffer, frame)
+
+        with self.condition:
+            if len(self.frames) >= self.max_pending:
+                dropped = self.frames.popleft()
+                self.free.append(dropped[0])
+                self.stats['dropped'] += 1
+            self.frames.append((buffer, detections, timestamp))
+            self.stats['queued'] += 1
+            self.condition.notify()
+
+    def pending(self):
+        with self.condition:
+            return len(self.frames)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.frames:
+                    self.condition.wait()
+                if not self.frames:
+                    break
+                frame, detections, timestamp = self.frames.popleft()
+            try:
+                self._write(frame, detections, timestamp)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.last_error = str(e)
+            finally:
+                with self.condition:
+                    if len(self.free) < self.max_pending:
+                        self.free.append(frame)
+        self._close_segment()
+
+    def _write(self, frame, detections, timestamp):
+        height, width = frame.shape[:2]
+        if (self.writer is None or (width, height) != self.size
+                or (self.segment_frames and self.segment_written >= self.segment_frames)):
+            self._open_segment((width, height))
+        if self.renderer is not None and detections:
+            self.renderer.draw(frame, detections)
+        self.writer.write(frame)
+        record = {'frame': self.segment_written, 'timestamp': timestamp, 'detections': detections or []}
+        self.records.write(json.dumps(record) + "\n")
+        self.segment_written += 1
+        self.stats['written'] += 1
+
+    def _open_segment(self, size):
+        self._close_segment()
+        os.makedirs(self.directory, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}_{timestamp}_{self.stats['segments'] + 1:04d}"
+                                            f"{self.extension}")
+        writer = cv2.VideoWriter(path, self.fourcc, self.fps, size)
+        if not writer.isOpened():
+            raise IOError(f"Could not open {path} for writing with codec {self.codec}")
+        self.writer = writer
+        self.records = open(os.path.splitext(path)[0] + ".jsonl", "w", encoding="utf-8")
+        self.size = size
+        self.segment_path = path
+        self.segment_written = 0
+        self.segments.append(path)
+        self.stats['segments'] += 1
+
+    def _close_segment(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.records.close()
+            self.writer = None
+            self.records = None
+
+    def close(self, timeout=10.0):
+        """Encode whatever is still queued, finish the current segment and stop the encoder thread"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout)
+
+
+def render_recording(video, output, records=None, codec="MJPG", renderer=None):
+    """Draw a recording's saved detections onto its frames; returns the number of frames written"""
+    renderer = renderer or OverlayRenderer()
+    records = records or os.path.splitext(video)[0] + ".jsonl"
+
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source: {video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+    writer = None
+    frames = 0
+    try:
+        with open(records, encoding="utf-8") as f:
+            for line in f:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+                    if not writer.isOpened():
+                        raise IOError(f"Could not open {output} for writing with codec {codec}")
+                renderer.draw(frame, json.loads(line)['detections'])
+                writer.write(frame)
+                frames += 1
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+    return frames
+
+
+class BurstCapture:
+    """Interval capture driven by the Tk event loop (e.g. 10 fps for 3 seconds)
+
+    capture is called on the UI thread every 1/fps seconds and should return
+    True when it queued a new frame. Ticks that find no new frame since the
+    previous capture are counted as repeats instead of saving duplicates.
+    """
+
+    def __init__(self, root, capture, fps=10.0, seconds=3.0):
+        self.root = root
+        self.capture = capture
+        self.fps = fps
+        self.seconds = seconds
+        self.total = 0
+        self.taken = 0
+        self.repeats = 0
+        self.running = False
+        self.job = None
+
+    def start(self):
+        if self.running:
+            return
+        self.total = max(1, int(round(self.fps * self.seconds)))
+        self.taken = 0
+        self.repeats = 0
+        self.running = True
+        self._tick()
+
+    def stop(self):
+        self.running = False
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def _tick(self):
+        if not self.running:
+            return
+        if self.capture():
+            self.taken += 1
+        else:
+            self.repeats += 1
+        if self.taken + self.repeats >= self.total:
+            self.running = False
+            self.job = None
+            return
+        self.job = self.root.after(int(1000 / self.fps), self._tick)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Draw the saved detections onto a recorded segment")
+    parser.add_argument("video", help="segment written by VideoRecorder (its .jsonl must sit next to it)")
+    parser.add_argument("--output", required=True, help="annotated video to write")
+    parser.add_argument("--records", help="detection records (default: VIDEO with a .jsonl extension)")
+    parser.add_argument("--codec", default="MJPG", help="four-character codec for the output")
+    args = parser.parse_args(argv)
+
+    try:
+        frames = render_recording(args.video, args.output, records=args.records, codec=args.codec)
+    except IOError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(f"Rendered {frames} frames -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import time
+
+import cv2
+
+from tracking import box_iou
+from buffers import BufferPool
+
+
+class MultiResDetector:
+    """Face detection on a downscaled frame, constrained to regions of interest
+
+    Every sweep_interval frames (or whenever a tracked face goes missing) the
+    cascade sweeps the whole frame downscaled by `downscale`. On the frames in
+    between it only searches windows around the previous frame's faces,
+    expanded by roi_margin of the face size on each side and with
+    minSize/maxSize bracketing the previous face size. Boxes are always
+    mapped back to full-resolution coordinates.
+
+    last holds the cost of the most recent call ('mode', 'ms', 'pixels');
+    stats accumulates calls and time per mode.
+    """
+
+    def __init__(self, downscale=0.5, sweep_interval=15, roi_margin=0.5, scale_factor=1.3,
+                 min_neighbors=5, min_face_size=48):
+        self.downscale = downscale
+        self.sweep_interval = sweep_interval
+        self.roi_margin = roi_margin
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_face_size = min_face_size
+
+        self.buffers = BufferPool()
+        self.previous = []
+        self.frames_since_sweep = 0
+        self.force_sweep = True
+        self.last = {'mode': None, 'ms': 0.0, 'pixels': 0}
+        self.stats = {'sweep': {'calls': 0, 'ms': 0.0}, 'roi': {'calls': 0, 'ms': 0.0}}
+
+    def reset(self):
+        self.previous = []
+        self.force_sweep = True
+
+    def _min_size(self, face_size):
+        side = max(1, int(round(face_size * self.downscale)))
+        return (side, side)
+
+    def _sweep(self, cascade, small):
+        min_side = self._min_size(self.min_face_size)
+        found = cascade.detectMultiScale(small, self.scale_factor, self.min_neighbors, minSize=min_side)
+        return [tuple(int(v) for v in face) for face in found], small.shape[0] * small.shape[1]
+
+    def _search_rois(self, cascade, small):
+        height, width = small.shape
+        found, pixels = [], 0
+        for (x, y, w, h) in self.previous:
+            # Window around the previous face, in downscaled coordinates
+            margin_x, margin_y = w * self.roi_margin, h * self.roi_margin
+            x0 = max(0, int((x - margin_x) * self.downscale))
+            y0 = max(0, int((y - margin_y) * self.downscale))
+            x1 = min(width, int((x + w + margin_x) * self.downscale) + 1)
+            y1 = min(height, int((y + h + margin_y) * self.downscale) + 1)
+            if x1 <= x0 or y1 <= y0:
+                continue
+
+            window = small[y0:y1, x0:x1]
+            pixels += window.size
+            faces = cascade.detectMultiScale(window, self.scale_factor, self.min_neighbors,
+                                             minSize=self._min_size(max(self.min_face_size, min(w, h) * 0.6)),
+                                             maxSize=self._min_size(max(w, h) * 1.6))
+            if len(faces) == 0:
+                # Someone left or moved too far: do a full sweep next frame
+                self.force_sweep = True
+            for (fx, fy, fw, fh) in faces:
+                box = (int(fx) + x0, int(fy) + y0, int(fw), int(fh))
+                if all(box_iou(box, other) < 0.5 for other in found):
+                    found.append(box)
+        return found, pixels
+
+    def detect(self, gray, cascade):
+        """Return full-resolution (x, y, w, h) face boxes for a grayscale frame"""
+        start = time.perf_counter()
+
+        if self.downscale != 1.0:
+            # Same size cv2.resize derives from fx/fy, so the reused buffer is written in place
+            height, width = gray.shape
+            size = (int(round(height * self.downscale)), int(round(width * self.downscale)))
+            small = cv2.resize(gray, None, dst=self.buffers.get('small', size), fx=self.downscale,
+                               fy=self.downscale, interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+
+        sweep = (self.force_sweep or not self.previous
+                 or self.frames_since_sweep >= self.sweep_interval - 1)
+        if sweep:
+            self.force_sweep = False
+            self.frames_since_sweep = 0
+            found, pixels = self._sweep(cascade, small)
+        else:
+            self.frames_since_sweep += 1
+            found, pixels = self._search_rois(cascade, small)
+
+        # Map back to full resolution
+        scale = 1.0 / self.downscale
+        faces = [(int(round(x * scale)), int(round(y * scale)), int(round(w * scale)), int(round(h * scale)))
+                 for (x, y, w, h) in found]
+        self.previous = faces
+
+        mode = 'sweep' if sweep else 'roi'
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        self.last = {'mode': mode, 'ms': elapsed_ms, 'pixels': pixels}
+        self.stats[mode]['calls'] += 1
+        self.stats[mode]['ms'] += elapsed_ms
+        return faces
+
+    def summary(self):
+        """Mean detection cost per mode in milliseconds"""
+        return {mode: {'calls': s['calls'], 'mean_ms': s['ms'] / s['calls'] if s['calls'] else 0.0}
+                for mode, s in self.stats.items()}
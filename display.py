@@ -0,0 +1,101 @@
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class DisplayBuffer:
+    """Display path that resizes before converting and reuses every buffer
+
+    The frame is first resized (BGR) into a preallocated buffer sized for the
+    display box, then converted to RGBA into a second preallocated buffer (PIL
+    stores RGB as 4 bytes per pixel, so only an RGBA buffer can be mapped
+    without a copy); a PIL image mapped over that buffer is pasted into one
+    persistent PhotoImage. Buffers and the PhotoImage are only recreated
+    when the source resolution changes. Overlays passed to show() are drawn
+    onto the RGBA buffer at display size, with positions scaled to match.
+
+    should_display() lets the UI skip frames when showing them would take
+    more than max_ui_share of the UI thread's time; shown/skipped counts are
+    kept for the status line.
+    """
+
+    def __init__(self, max_width=700, max_height=500, max_ui_share=0.5):
+        self.max_width = max_width
+        self.max_height = max_height
+        self.max_ui_share = max_ui_share
+
+        self.source_shape = None
+        self.scale = 1.0
+        self.size = None
+        self.resized = None
+        self.rgba = None
+        self.pil_image = None
+        self.photo = None
+
+        self.display_cost = 0.0
+        self.next_display = 0.0
+        self.shown = 0
+        self.skipped = 0
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        scale = 1.0
+        if width > self.max_width or height > self.max_height:
+            scale = min(self.max_width/width, self.max_height/height)
+        self.size = (int(width * scale), int(height * scale))
+        self.scale = scale
+        self.source_shape = shape
+
+        # Only needs a resize buffer when the frame is actually scaled down
+        self.resized = None
+        if self.size != (width, height):
+            self.resized = np.empty((self.size[1], self.size[0], 3), np.uint8)
+        self.rgba = np.empty((self.size[1], self.size[0], 4), np.uint8)
+
+        # PIL image sharing the RGBA buffer's memory
+        self.pil_image = Image.frombuffer('RGBA', self.size, self.rgba, 'raw', 'RGBA', 0, 1)
+        self.photo = None
+
+    def prepare(self, frame):
+        """Resize and convert a BGR frame into the reused RGBA buffer and return it"""
+        if frame.shape != self.source_shape:
+            self._allocate(frame.shape)
+
+        source = frame
+        if self.resized is not None:
+            cv2.resize(frame, self.size, dst=self.resized)
+            source = self.resized
+        cv2.cvtColor(source, cv2.COLOR_BGR2RGBA, dst=self.rgba)
+        return self.rgba
+
+    def should_display(self, now=None):
+        """False when the UI should skip this frame to keep up"""
+        now = time.perf_counter() if now is None else now
+        if now < self.next_display:
+            self.skipped += 1
+            return False
+        return True
+
+    def show(self, label, frame, detections=None, renderer=None):
+        """Draw frame (plus any detections, via renderer) into the Tk label, reusing the same PhotoImage"""
+        # Imported lazily so headless users of prepare() don't need Tk
+        from PIL import ImageTk
+
+        start = time.perf_counter()
+        self.prepare(frame)
+        if detections and renderer is not None:
+            renderer.draw(self.rgba, detections, scale=self.scale, rgb=True)
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(self.pil_image)
+            label.config(image=self.photo)
+            label.image = self.photo  # Keep a reference
+        else:
+            self.photo.paste(self.pil_image)
+        end = time.perf_counter()
+
+        # Leave the UI thread at least (1 - max_ui_share) of its time for everything else
+        self.display_cost = 0.8 * self.display_cost + 0.2 * (end - start) if self.shown else end - start
+        self.next_display = end + self.display_cost * (1.0 / self.max_ui_share - 1.0)
+        self.shown += 1
@@ -0,0 +1,119 @@
+import time
+
+import cv2
+
+from metrics import NULL_METRICS
+from buffers import BufferPool
+from features import brightness_stats
+
+# Vertical bands of the face (fractions of its height) searched by each cascade
+SMILE_REGION = (0.5, 1.0)
+EYE_REGION = (0.0, 0.6)
+
+STAGES = ('smile', 'contrast', 'eyes', 'edges')
+
+# Hot-path metric each stage is reported under (metrics.StageMetrics)
+STAGE_METRICS = {'smile': 'smile_cascade', 'eyes': 'eye_cascade', 'edges': 'canny'}
+
+
+def _band(face_gray, region):
+    height = face_gray.shape[0]
+    return face_gray[int(height * region[0]):int(height * region[1])]
+
+
+class StagedEmotionEvaluator:
+    """Lazy version of the emotion heuristics that only computes what a rule needs
+
+    The rules are the same as detect_emotion_simple, evaluated in order:
+    a smile (searched in the lower half of the face only) returns 'Happy'
+    before anything else runs; the eye cascade (upper part of the face only)
+    runs only when the face is contrasty enough for the eye rule to matter;
+    Canny runs only once a rule actually needs the edge density. Because the
+    cascades see sub-regions, labels can differ slightly from the full-face
+    search.
+
+    Per-stage run counts and timings plus per-label decision counts are kept
+    in stats; report() summarizes them.
+    """
+
+    def __init__(self, eye_cascade, smile_cascade, metrics=NULL_METRICS):
+        self.eye_cascade = eye_cascade
+        self.smile_cascade = smile_cascade
+        self.metrics = metrics
+        self.buffers = BufferPool()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.faces = 0
+        self.stats = {stage: {'runs': 0, 'seconds': 0.0} for stage in STAGES}
+        self.decisions = {}
+
+    def _timed(self, stage, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        elapsed = time.perf_counter() - start
+        entry = self.stats[stage]
+        entry['runs'] += 1
+        entry['seconds'] += elapsed
+        if self.metrics.enabled and stage in STAGE_METRICS:
+            self.metrics.record(STAGE_METRICS[stage], elapsed)
+        return value
+
+    def _smiles(self, face_gray):
+        return len(self.smile_cascade.detectMultiScale(_band(face_gray, SMILE_REGION), 1.8, 20))
+
+    def _eyes(self, face_gray):
+        return len(self.eye_cascade.detectMultiScale(_band(face_gray, EYE_REGION), 1.1, 3))
+
+    @staticmethod
+    def _contrast(face_gray):
+        return brightness_stats(face_gray)
+
+    def _edge_density(self, face_gray):
+        edges = cv2.Canny(face_gray, 30, 100, edges=self.buffers.get('edges', face_gray.shape))
+        height, width = face_gray.shape
+        return cv2.countNonZero(edges) * 255 / (height * width)
+
+    def _decide(self, face_gray):
+        if self._timed('smile', self._smiles, face_gray) > 0:
+            return 'Happy'
+
+        # The eye rule only fires on contrasty faces, so check that before the cascade
+        mean_brightness, brightness_std = self._timed('contrast', self._contrast, face_gray)
+        eyes_rule = brightness_std > 45 and self._timed('eyes', self._eyes, face_gray) >= 2
+
+        # Every remaining rule needs the edge density
+        edge_density = self._timed('edges', self._edge_density, face_gray)
+        if eyes_rule:
+            return 'Surprise' if edge_density > 0.15 else 'Fear'
+        if edge_density > 0.2:
+            return 'Angry'
+        if mean_brightness < 80:
+            return 'Sad'
+        return 'Neutral'
+
+    def evaluate(self, face_gray):
+        """Return the emotion label for a grayscale face crop"""
+        self.faces += 1
+        try:
+            label = self._decide(face_gray)
+        except cv2.error:
+            label = 'Neutral'
+        self.decisions[label] = self.decisions.get(label, 0) + 1
+        return label
+
+    def report(self):
+        """Per-stage hit rates and timings, plus cascade runs saved vs running both every time"""
+        faces = max(self.faces, 1)
+        stages = {stage: {'runs': s['runs'],
+                          'hit_rate': s['runs'] / faces,
+                          'mean_ms': s['seconds'] * 1000.0 / s['runs'] if s['runs'] else 0.0,
+                          'total_ms': s['seconds'] * 1000.0}
+                  for stage, s in self.stats.items()}
+        cascade_runs = self.stats['smile']['runs'] + self.stats['eyes']['runs']
+        return {
+            'faces': self.faces,
+            'stages': stages,
+            'decisions': dict(self.decisions),
+            'cascade_runs_saved': 2 * self.faces - cascade_runs
+        }
@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import deque
+
+import cv2
+
+from metrics import NULL_METRICS
+from motion import MotionGate
+from pipeline import LatestFrameGrabber, LatencyStats
+
+
+def parse_source(source):
+    """Camera indexes arrive as strings on the command line"""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class Source:
+    """One camera, video file or stream feeding the engine
+
+    Holds the newest-frame grabber for the source plus its counters. At
+    most one frame per source is in flight at a time; frames that arrive
+    while it is being analyzed replace each other and are counted as
+    dropped by the grabber.
+    """
+
+    def __init__(self, index, source, cap, on_frame, metrics=NULL_METRICS, fps_window=60, latency_window=120,
+                 gate=None):
+        self.index = index
+        self.source = source
+        self.name = str(source)
+        self.cap = cap
+
+        # Files are read at their own frame rate and end at their last frame
+        is_file = isinstance(source, str) and os.path.isfile(source)
+        pace_fps = (cap.get(cv2.CAP_PROP_FPS) or 30.0) if is_file else None
+        self.grabber = LatestFrameGrabber(cap, metrics, pace_fps=pace_fps, stop_at_end=is_file,
+                                          on_frame=on_frame)
+
+        # Optional per-source motion.MotionGate (static scenes reuse the last detections)
+        self.gate = gate
+
+        self.busy = False
+        self.sequence = 0
+        self.analyzed = 0
+        self.errors = 0
+        self.finished_at = deque(maxlen=fps_window)
+        self.latency = LatencyStats(latency_window)
+        self.result = None
+
+    @property
+    def done(self):
+        return self.grabber.ended and self.grabber.sequence <= self.sequence and not self.busy
+
+    def has_frame(self):
+        return not self.busy and self.grabber.sequence > self.sequence
+
+    def fps(self):
+        """Analyzed frames per second over the recent window"""
+        if len(self.finished_at) < 2:
+            return 0.0
+        span = self.finished_at[-1] - self.finished_at[0]
+        return (len(self.finished_at) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        stats = self.latency.summary()
+        stats['source'] = self.name
+        stats['captured'] = self.grabber.sequence
+        stats['analyzed'] = self.analyzed
+        stats['dropped'] = self.grabber.dropped
+        stats['errors'] = self.errors
+        stats['fps'] = self.fps()
+        stats['skip_ratio'] = self.gate.skip_ratio() if self.gate is not None else 0.0
+        stats['ended'] = self.grabber.ended
+        return stats
+
+
+class MultiSourceEngine:
+    """Analyze several cameras/streams on one shared pool of analysis workers
+
+    Every source gets its own capture thread that keeps only its newest
+    frame. A fixed pool of worker threads, each with its own analyzer built
+    once by analyzer_factory (so cascades are loaded per worker, not per
+    camera), picks frames round-robin across the sources that have a new
+    frame and none in flight. When the pool can't keep up every source is
+    slowed down by the same share and each drops its own stale frames,
+    so one busy camera can't starve the others.
+
+    Results are dicts tagged with 'source' and 'source_index'; they are
+    passed to on_result (called on the worker thread) and the newest one
+    per source is available from latest_result(). Analysis only reads the
+    captured 'frame'; a consumer that wants it annotated draws the
+    'detections' with render.OverlayRenderer. motion_gate is a dict of
+    MotionGate options; each source then gets its own gate and static
+    frames skip analysis (results carry 'analyzed': False).
+    """
+
+    def __init__(self, sources, workers=2, analyzer_factory=None, on_result=None, metrics=NULL_METRICS,
+                 open_capture=cv2.VideoCapture, motion_gate=None):
+        if analyzer_factory is None:
+            from face_analyzer import FaceAnalyzer
+            analyzer_factory = FaceAnalyzer
+        self.analyzer_factory = analyzer_factory
+        self.workers = max(1, workers)
+        self.on_result = on_result
+        self.metrics = metrics
+
+        self.condition = threading.Condition()
+        self.cursor = 0
+        self.running = False
+        self.threads = []
+
+        self.sources = []
+        for index, source in enumerate(sources):
+            source = parse_source(source)
+            cap = open_capture(source)
+            if not cap.isOpened():
+                self.release()
+                raise IOError(f"Could not open video source: {source}")
+            gate = MotionGate(None, **motion_gate) if motion_gate is not None else None
+            self.sources.append(Source(index, source, cap, self._wake, metrics, gate=gate))
+
+    def _wake(self):
+        with self.condition:
+            self.condition.notify()
+
+    def start(self):
+        # Build every worker's analyzer up front so a missing cascade fails here
+        analyzers = [self.analyzer_factory() for _ in range(self.workers)]
+        for analyzer in analyzers:
+            if not getattr(analyzer, 'model_loaded', True):
+                raise RuntimeError(analyzer.status_text)
+
+        self.running = True
+        for source in self.sources:
+            source.grabber.start()
+        for number, analyzer in enumerate(analyzers):
+            thread = threading.Thread(target=self._work, args=(analyzer,), name=f"engine-{number}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        for source in self.sources:
+            source.grabber.stop()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.threads = []
+        self.release()
+
+    def release(self):
+        for source in self.sources:
+            source.cap.release()
+
+    def finished(self):
+        """True once every source has ended and its last frame was analyzed"""
+        with self.condition:
+            return all(source.done for source in self.sources)
+
+    def _next_source(self):
+        # Round-robin from the source after the one served last; caller holds the condition
+        count = len(self.sources)
+        for offset in range(count):
+            source = self.sources[(self.cursor + offset) % count]
+            if source.has_frame():
+                self.cursor = (source.index + 1) % count
+                return source
+        return None
+
+    def _work(self, analyzer):
+        while self.running:
+            with self.condition:
+                source = self._next_source()
+                while source is None and self.running:
+                    self.condition.wait(0.1)
+                    source = self._next_source()
+                if source is None:
+                    break
+                source.busy = True
+
+            taken = source.grabber.take(source.sequence, timeout=0)
+            if taken is None:
+                with self.condition:
+                    source.busy = False
+                continue
+            sequence, timestamp, frame = taken
+
+            result = None
+            try:
+                # A source has one frame in flight at most, so its gate is never used concurrently
+                if source.gate is not None and source.result is not None and not source.gate.changed(frame):
+                    detections = source.result['detections']
+                    analyzed = False
+                else:
+                    detections = analyzer.analyze(frame)
+                    analyzed = True
+                finished = time.perf_counter()
+                result = {
+                    'source': source.name,
+                    'source_index': source.index,
+                    'sequence': sequence,
+                    'captured_at': timestamp,
+                    'analyzed_at': finished,
+                    'frame': frame,
+                    'detections': detections,
+                    'analyzed': analyzed
+                }
+            except cv2.error:
+                finished = time.perf_counter()
+
+            with self.condition:
+                source.sequence = sequence
+                source.busy = False
+                if result is None:
+                    source.errors += 1
+                else:
+                    source.analyzed += 1
+                    source.finished_at.append(finished)
+                    source.latency.add(finished - timestamp)
+                    source.result = result
+                self.condition.notify_all()
+
+            if result is not None and self.on_result is not None:
+                self.on_result(result)
+
+    def latest_result(self, source_index, after_sequence=0):
+        """Newest finished result for one source if it is newer than after_sequence"""
+        result = self.sources[source_index].result
+        if result is None or result['sequence'] <= after_sequence:
+            return None
+        return result
+
+    def stats(self):
+        """Per-source counters plus totals across all sources"""
+        with self.condition:
+            per_source = [source.stats() for source in self.sources]
+        return {
+            'workers': self.workers,
+            'sources': per_source,
+            'analyzed': sum(s['analyzed'] for s in per_source),
+            'dropped': sum(s['dropped'] for s in per_source),
+            'fps': sum(s['fps'] for s in per_source)
+        }
+
+
+def print_stats(stats, out=sys.stderr):
+    for entry in stats['sources']:
+        print(f"  [{entry['source']}] {entry['fps']:5.1f} fps  analyzed {entry['analyzed']:>6}  "
+              f"dropped {entry['dropped']:>6}  latency p95 {entry['p95_ms']:6.1f} ms  "
+              f"motion skipped {entry['skip_ratio']:.0%}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze several cameras or streams on a shared worker pool")
+    parser.add_argument("sources", nargs="+", help="camera indexes, video files or stream URLs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="analysis worker threads")
+    parser.add_argument("--no-age", action="store_true", help="disable age estimation")
+    parser.add_argument("--no-emotion", action="store_true", help="disable emotion detection")
+    parser.add_argument("--staged-emotion", action="store_true",
+                        help="evaluate emotion rules lazily, searching eyes/smiles in half-face regions")
+    parser.add_argument("--output", help="write JSON lines to this file")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 = until sources end)")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="seconds between per-source stats lines")
+    parser.add_argument("--results-log", help="append every detection to a compact binary log in this directory")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="skip analysis and reuse the last detections while a scene is static")
+    parser.add_argument("--motion-sensitivity", type=float, default=0.002,
+                        help="fraction of low-res pixels that must change to count as motion")
+    parser.add_argument("--motion-refresh", type=int, default=30,
+                        help="force a full analysis at least every N frames with --motion-gate")
+    args = parser.parse_args(argv)
+
+    from face_analyzer import FaceAnalyzer
+
+    def analyzer_factory():
+        return FaceAnalyzer(age_enabled=not args.no_age, emotion_enabled=not args.no_emotion,
+                            staged_emotion=args.staged_emotion)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+    write_lock = threading.Lock()
+
+    sink = None
+    if args.results_log:
+        from results import ResultsSink
+        sink = ResultsSink(args.results_log)
+
+    def on_result(result):
+        if sink is not None:
+            sink.add(result['detections'], frame=result['sequence'], source=result['source'])
+        if out is None:
+            return
+        record = {
+            'source': result['source'],
+            'sequence': result['sequence'],
+            'latency_ms': (result['analyzed_at'] - result['captured_at']) * 1000.0,
+            'detections': result['detections']
+        }
+        with write_lock:
+            out.write(json.dumps(record) + "\n")
+
+    try:
+        motion_gate = None
+        if args.motion_gate:
+            motion_gate = {'min_changed': args.motion_sensitivity, 'refresh_interval': args.motion_refresh}
+        engine = MultiSourceEngine(args.sources, workers=args.workers, analyzer_factory=analyzer_factory,
+                                   on_result=on_result, motion_gate=motion_gate)
+        engine.start()
+    except (IOError, RuntimeError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    next_report = start + args.stats_interval
+    try:
+        while not engine.finished():
+            now = time.perf_counter()
+            if args.duration and now - start >= args.duration:
+                break
+            if now >= next_report:
+                print(f"{now - start:.0f}s:", file=sys.stderr)
+                print_stats(engine.stats())
+                next_report = now + args.stats_interval
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        if out is not None:
+            out.close()
+        if sink is not None:
+            sink.close()
+
+    stats = engine.stats()
+    print(f"Analyzed {stats['analyzed']} frames from {len(stats['sources'])} sources "
+          f"on {stats['workers']} workers in {time.perf_counter() - start:.2f}s "
+          f"({stats['dropped']} dropped)", file=sys.stderr)
+    print_stats(stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
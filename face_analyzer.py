@@ -0,0 +1,589 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import cv2
+import numpy as np
+
+from features import extract_face_features, classify_ages, classify_emotions, brightness_stats
+from emotion import StagedEmotionEvaluator
+from metrics import NULL_METRICS
+from buffers import BufferPool
+from framestore import ReplayCapture, is_frame_store
+from render import OverlayRenderer
+
+# Age groups
+AGE_LIST = ['(18-20)', '(24-26)', '(28-32)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
+
+# Emotion labels
+EMOTION_LIST = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+FACE_CASCADE = 'haarcascade_frontalface_default.xml'
+EYE_CASCADE = 'haarcascade_eye.xml'
+SMILE_CASCADE = 'haarcascade_smile.xml'
+
+
+def load_cascade(name):
+    """Load one of OpenCV's bundled Haar cascades, failing loudly if it is missing"""
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + name)
+    if cascade.empty():
+        raise IOError(f"Could not load {name}")
+    return cascade
+
+
+class FaceAnalyzer:
+    """Face, age and emotion detection engine with no GUI dependency
+
+    The Tk apps in main.py and opencam.py are thin wrappers around this class;
+    it can also be driven directly over video files, image folders or numpy
+    arrays through process().
+
+    analyze() only reads the frame. detect_faces_age_emotion() also draws
+    the overlays onto it through self.renderer unless annotate is False,
+    for callers that render the detections themselves (e.g. onto a
+    display-sized buffer).
+
+    Models load on first use: the face cascade the first time faces are
+    detected and the eye/smile cascades the first time emotion detection is
+    enabled, so age-only users never load them. preload=True (the default)
+    loads what the current toggles need right away.
+    """
+
+    def __init__(self, age_enabled=True, emotion_enabled=True, age_list=None, label_scale=0.7,
+                 executor=None, detector=None, staged_emotion=False, metrics=None, backend=None,
+                 cache=None, preload=True):
+        # Detection toggles (plain booleans so no Tk root is required)
+        self.age_enabled = age_enabled
+        self.emotion_enabled = emotion_enabled
+        self.label_scale = label_scale
+        self.renderer = OverlayRenderer(label_scale=label_scale)
+        self.annotate = True
+
+        # Optional parallel.FaceExecutor for fanning per-face work out to a pool
+        self.executor = executor
+
+        # Optional face detector (e.g. detection.MultiResDetector); None scans the full frame
+        self.detector = detector
+
+        # Optional backends.DnnBackend replacing the Haar detector and/or heuristic classifiers
+        self.backend = backend
+
+        # Optional cache.FaceCache memoizing (age, emotion) per near-identical face crop
+        self.cache = cache
+
+        # Per-stage timing hooks (metrics.StageMetrics); the shared instance is disabled
+        self.metrics = metrics or NULL_METRICS
+
+        # Reused grayscale/edge scratch buffers, so steady-state frames allocate no image memory
+        self.buffers = BufferPool()
+
+        self.age_list = list(age_list) if age_list is not None else list(AGE_LIST)
+        self.emotion_list = list(EMOTION_LIST)
+
+        # Cascades are loaded on demand (see ensure_models)
+        self.face_cascade = None
+        self.eye_cascade = None
+        self.smile_cascade = None
+        self.model_lock = threading.Lock()
+        self.model_error = None
+        self.model_loaded = False
+        self.status_text = "Detection models load on first use"
+
+        # Optional lazy emotion evaluation with sub-region cascades (built with the eye/smile cascades)
+        self.staged_emotion = staged_emotion
+        self.emotion_evaluator = None
+
+        if preload:
+            self.load_models()
+
+    def load_models(self):
+        """Load the models the current toggles need: the face cascade, plus eye/smile for emotion"""
+        self.ensure_models(faces=True)
+        return self.model_loaded
+
+    def ensure_models(self, faces=False, emotion=None):
+        """Load any cascade that is needed and not loaded yet; returns False if loading failed
+
+        emotion defaults to the current emotion_enabled toggle; callers that
+        have already read the toggle pass the value they are going to use.
+        """
+        if self.model_error is not None:
+            return False
+        emotion = self.emotion_enabled if emotion is None else emotion
+        need_face = faces and self.face_cascade is None
+        need_emotion = emotion and self.eye_cascade is None
+        if not (need_face or need_emotion):
+            return True
+
+        with self.model_lock:
+            try:
+                if need_face and self.face_cascade is None:
+                    self.face_cascade = load_cascade(FACE_CASCADE)
+                    self.model_loaded = True
+                    self.status_text = "Detection models loaded successfully"
+                if need_emotion and self.eye_cascade is None:
+                    smile_cascade = load_cascade(SMILE_CASCADE)
+                    eye_cascade = load_cascade(EYE_CASCADE)
+                    if self.staged_emotion:
+                        self.emotion_evaluator = StagedEmotionEvaluator(eye_cascade, smile_cascade, self.metrics)
+                    self.smile_cascade = smile_cascade
+                    # Set last: other threads treat a non-None eye_cascade as "emotion models ready"
+                    self.eye_cascade = eye_cascade
+            except Exception as e:
+                self.model_error = str(e)
+                self.model_loaded = False
+                self.status_text = f"Error loading models: {str(e)}"
+                return False
+        return True
+
+    def estimate_age_simple(self, face_roi):
+        """Simple age estimation based on face characteristics"""
+        # Convert to grayscale for analysis
+        gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY,
+                                 dst=self.buffers.get('age_gray', face_roi.shape[:2]))
+
+        # Calculate some basic features
+        height, width = gray_face.shape
+
+        # Calculate edge density (more edges might indicate older age due to wrinkles)
+        with self.metrics.stage('canny'):
+            edges = cv2.Canny(gray_face, 50, 150, edges=self.buffers.get('edges', gray_face.shape))
+        edge_density = np.sum(edges) / (height * width)
+
+        # Normalize edge density
+        edge_density_norm = min(edge_density / 50, 1.0)
+
+        # Simple age estimation based on edge density and face size
+        if edge_density_norm < 0.1:
+            return self.age_list[0]
+        elif edge_density_norm < 0.2:
+            return self.age_list[1]
+        elif edge_density_norm < 0.3:
+            return self.age_list[2]
+        elif edge_density_norm < 0.4:
+            return self.age_list[3]
+        elif edge_density_norm < 0.5:
+            return self.age_list[4]
+        elif edge_density_norm < 0.6:
+            return self.age_list[5]
+        elif edge_density_norm < 0.7:
+            return self.age_list[6]
+        else:
+            return self.age_list[7]
+
+    def detect_emotion_simple(self, face_gray):
+        """Simple emotion detection based on facial features"""
+        try:
+            # Detect eyes and smile within the face region
+            with self.metrics.stage('eye_cascade'):
+                eyes = self.eye_cascade.detectMultiScale(face_gray, 1.1, 3)
+            with self.metrics.stage('smile_cascade'):
+                smiles = self.smile_cascade.detectMultiScale(face_gray, 1.8, 20)
+
+            # Calculate basic features for emotion estimation
+            height, width = face_gray.shape
+
+            # Analyze brightness and contrast
+            mean_brightness, brightness_std = brightness_stats(face_gray)
+
+            # Detect edges for expression analysis
+            with self.metrics.stage('canny'):
+                edges = cv2.Canny(face_gray, 30, 100, edges=self.buffers.get('edges', face_gray.shape))
+            edge_density = np.sum(edges) / (height * width)
+
+            # Simple heuristic-based emotion detection
+            if len(smiles) > 0:
+                # Strong smile detected
+                return 'Happy'
+            elif len(eyes) >= 2 and brightness_std > 45:
+                # Eyes detected with high contrast (possibly surprise/fear)
+                if edge_density > 0.15:
+                    return 'Surprise'
+                else:
+                    return 'Fear'
+            elif edge_density > 0.2:
+                # High edge density might indicate anger (furrowed brow)
+                return 'Angry'
+            elif mean_brightness < 80:
+                # Darker image might indicate sadness
+                return 'Sad'
+            elif edge_density < 0.05:
+                # Very smooth face might indicate neutral
+                return 'Neutral'
+            else:
+                # Default to neutral for ambiguous cases
+                return 'Neutral'
+
+        except Exception:
+            return 'Neutral'
+
+    def analyze_face(self, face_roi, face_gray):
+        """Return (age, emotion) for one face; disabled estimates are None"""
+        # The toggles can change on the UI thread mid-call, so they are read once
+        age_enabled, emotion_enabled = self.age_enabled, self.emotion_enabled
+        self.ensure_models(emotion=emotion_enabled)
+        emotion_enabled = emotion_enabled and self.eye_cascade is not None
+        estimated_age = None
+        estimated_emotion = None
+
+        # Estimate age if enabled
+        if age_enabled:
+            estimated_age = self.estimate_age_simple(face_roi)
+
+        # Detect emotion if enabled
+        if emotion_enabled:
+            if self.emotion_evaluator is not None:
+                estimated_emotion = self.emotion_evaluator.evaluate(face_gray)
+            else:
+                estimated_emotion = self.detect_emotion_simple(face_gray)
+
+        return estimated_age, estimated_emotion
+
+    def analyze_faces(self, gray, faces, frame=None):
+        """Return [(age, emotion), ...] for all faces in a frame in one batch
+
+        Features are extracted once per face and classified with the
+        vectorized equivalents of estimate_age_simple/detect_emotion_simple.
+        With a DNN backend (and the BGR frame) its classifiers run one
+        batched forward pass per frame instead.
+        """
+        # The toggles can change on the UI thread mid-call, so they are read once; emotion is
+        # skipped if its cascades could not be loaded
+        age_enabled, emotion_enabled = self.age_enabled, self.emotion_enabled
+        self.ensure_models(emotion=emotion_enabled)
+        emotion_enabled = emotion_enabled and self.eye_cascade is not None
+        dnn_ages = dnn_emotions = None
+        if self.backend is not None and frame is not None:
+            dnn_ages, dnn_emotions = self.backend.classify(frame, gray, faces, age_enabled,
+                                                           emotion_enabled, self.metrics)
+
+        staged = self.emotion_evaluator is not None
+        need_age = age_enabled and dnn_ages is None
+        need_emotion = emotion_enabled and dnn_emotions is None
+        features = extract_face_features(gray, faces, self.eye_cascade, self.smile_cascade,
+                                         need_age=need_age,
+                                         need_emotion=need_emotion and not staged,
+                                         metrics=self.metrics, buffers=self.buffers)
+        if dnn_ages is not None:
+            ages = dnn_ages
+        else:
+            ages = classify_ages(features, self.age_list) if age_enabled else [None] * len(faces)
+        if dnn_emotions is not None:
+            emotions = dnn_emotions
+        elif not emotion_enabled:
+            emotions = [None] * len(faces)
+        elif staged:
+            emotions = [self.emotion_evaluator.evaluate(gray[y:y+h, x:x+w]) for (x, y, w, h) in faces]
+        else:
+            emotions = classify_emotions(features)
+        return list(zip(ages, emotions))
+
+    def get_emotion_color(self, emotion):
+        """Get color for emotion label"""
+        return self.renderer.emotion_color(emotion)
+
+    def draw_labels(self, frame, x, y, estimated_age, estimated_emotion):
+        """Draw age/emotion labels stacked above a face at (x, y)"""
+        self.renderer.draw_labels(frame, x, y, estimated_age, estimated_emotion)
+
+    def detect_faces(self, gray, frame=None):
+        """Return face boxes for a grayscale frame (the BGR frame is needed by a DNN detector)"""
+        if self.backend is not None and self.backend.face_detector is not None and frame is not None:
+            with self.metrics.stage('dnn_face'):
+                return self.backend.detect(frame)
+        if not self.ensure_models(faces=True):
+            return []
+        with self.metrics.stage('face_cascade'):
+            if self.detector is not None:
+                return self.detector.detect(gray, self.face_cascade)
+            return self.face_cascade.detectMultiScale(gray, 1.3, 5)
+
+    def estimate_faces(self, frame, gray, faces):
+        """Return [(age, emotion), ...] for faces, on the worker pool when it pays off
+
+        Both paths crop from frame and gray as given, before any overlay is
+        drawn, so the labels do not depend on which path a frame takes.
+        """
+        # A DNN backend batches all faces itself, so the per-face pool is bypassed
+        if self.executor is not None and self.backend is None and len(faces) >= self.executor.min_faces:
+            return self.executor.analyze_faces(
+                [(frame[y:y+h, x:x+w], gray[y:y+h, x:x+w]) for (x, y, w, h) in faces],
+                self.age_enabled, self.emotion_enabled)
+        return self.analyze_faces(gray, faces, frame)
+
+    def estimate(self, frame, gray, faces):
+        """Return [(age, emotion), ...] for faces, reusing cached results when a cache is set"""
+        if self.cache is None:
+            return self.estimate_faces(frame, gray, faces)
+        return self.cache.analyze(gray, faces, lambda missing: self.estimate_faces(frame, gray, missing),
+                                  context=self.cache_context())
+
+    def cache_context(self):
+        """What the cached estimates depend on besides the crop itself"""
+        backend = self.backend.name if self.backend is not None else None
+        return (self.age_enabled, self.emotion_enabled, self.staged_emotion, backend)
+
+    def analyze(self, frame):
+        """Detect faces and estimate ages and emotions without modifying frame"""
+        uses_cascade = self.backend is None or self.backend.face_detector is None
+        if not self.ensure_models(faces=uses_cascade):
+            return []
+
+        with self.metrics.stage('grayscale'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.buffers.get('gray', frame.shape[:2]))
+        faces = self.detect_faces(gray, frame)
+        estimates = self.estimate(frame, gray, faces)
+
+        return [{
+            'position': (int(x), int(y), int(w), int(h)),
+            'age': estimated_age,
+            'emotion': estimated_emotion
+        } for (x, y, w, h), (estimated_age, estimated_emotion) in zip(faces, estimates)]
+
+    def detect_faces_age_emotion(self, frame):
+        """Detect faces, estimate ages and emotions and (if annotate) draw them onto frame"""
+        detections = self.analyze(frame)
+        if self.annotate:
+            with self.metrics.stage('overlay'):
+                self.renderer.draw(frame, detections)
+        return frame, detections
+
+    def process(self, frames, annotate=False, analyze=None):
+        """Analyze a stream of frames and yield one record per frame
+
+        Each record is a dict with the frame index, processing time in
+        seconds and the detections; when annotate is True the annotated
+        frame is included under 'frame'. analyze overrides the per-frame
+        step (e.g. tracking.FaceTracker.update) and must return
+        (frame, detections) like detect_faces_age_emotion.
+        """
+        analyze = analyze or self.detect_faces_age_emotion
+        for index, frame in enumerate(frames):
+            start = time.perf_counter()
+            annotated, detections = analyze(frame)
+            record = {
+                'frame_index': index,
+                'elapsed': time.perf_counter() - start,
+                'detections': detections
+            }
+            if self.detector is not None:
+                record['detection_cost'] = dict(self.detector.last)
+            if annotate:
+                record['frame'] = annotated
+            yield record
+
+
+def frames_from_video(source):
+    """Yield frames from a video file, stream URL or camera index"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source: {source}")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def frames_from_store(path):
+    """Yield the frames of a framestore recording, as fast as possible"""
+    cap = ReplayCapture(path, realtime=False)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def frames_from_folder(folder):
+    """Yield frames from every image in a folder, in filename order"""
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        frame = cv2.imread(os.path.join(folder, name))
+        if frame is not None:
+            yield frame
+
+
+def frames_from_arrays(arrays):
+    """Yield BGR frames from an iterable of numpy arrays"""
+    for array in arrays:
+        frame = np.asarray(array, dtype=np.uint8)
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        yield frame
+
+
+def open_source(source):
+    """Pick a frame generator for a camera index, folder, video path or array iterable"""
+    if isinstance(source, int):
+        return frames_from_video(source)
+    if isinstance(source, str):
+        if source.isdigit():
+            return frames_from_video(int(source))
+        if is_frame_store(source):
+            return frames_from_store(source)
+        if os.path.isdir(source):
+            return frames_from_folder(source)
+        return frames_from_video(source)
+    return frames_from_arrays(source)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run face, age and emotion detection without a GUI")
+    parser.add_argument("source", help="video file, image folder, frame store, stream URL or camera index")
+    parser.add_argument("--no-age", action="store_true", help="disable age estimation")
+    parser.add_argument("--no-emotion", action="store_true", help="disable emotion detection")
+    parser.add_argument("--output", help="write JSON lines to this file instead of stdout")
+    parser.add_argument("--face-workers", type=int, default=0,
+                        help="analyze faces on a pool of this many workers (0 = inline)")
+    parser.add_argument("--executor", choices=("process", "thread"), default="process",
+                        help="worker pool kind for --face-workers")
+    parser.add_argument("--track-interval", type=int, default=0,
+                        help="track faces and run full detection only every N frames")
+    parser.add_argument("--detect-scale", type=float, default=1.0,
+                        help="run the face cascade on a frame downscaled by this factor, "
+                             "searching around previous faces between full sweeps")
+    parser.add_argument("--staged-emotion", action="store_true",
+                        help="evaluate emotion rules lazily, searching eyes/smiles in half-face regions")
+    parser.add_argument("--sweep-interval", type=int, default=15,
+                        help="full-frame sweep every N frames with --detect-scale")
+    parser.add_argument("--backend", choices=("haar", "dnn"), default="haar",
+                        help="haar cascades and heuristics, or cv2.dnn models from --models-dir")
+    parser.add_argument("--models-dir", default="models", help="directory holding the DNN model files")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="memoize age/emotion for up to N near-identical face crops (0 = off)")
+    parser.add_argument("--cache-ttl", type=float, default=2.0, help="seconds a cached face result stays valid")
+    parser.add_argument("--results-log", help="append every detection to a compact binary log in this directory")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="skip analysis and reuse the last detections while the scene is static")
+    parser.add_argument("--motion-sensitivity", type=float, default=0.002,
+                        help="fraction of low-res pixels that must change to count as motion")
+    parser.add_argument("--motion-refresh", type=int, default=30,
+                        help="force a full analysis at least every N frames with --motion-gate")
+    parser.add_argument("--target-fps", type=float,
+                        help="lower detection quality as needed to keep per-frame analysis within 1/FPS")
+    parser.add_argument("--target-latency", type=float, help="per-frame analysis budget in ms (like --target-fps)")
+    parser.add_argument("--quality-log", help="append the quality controller's decisions to this JSON lines file")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_size > 0:
+        from cache import FaceCache
+        cache = FaceCache(max_entries=args.cache_size, ttl=args.cache_ttl)
+
+    backend = None
+    if args.backend == "dnn":
+        from backends import load_dnn_backend
+        try:
+            backend = load_dnn_backend(args.models_dir)
+        except (IOError, cv2.error) as e:
+            print(str(e), file=sys.stderr)
+            return 1
+
+    detector = None
+    if args.detect_scale != 1.0:
+        from detection import MultiResDetector
+        detector = MultiResDetector(downscale=args.detect_scale, sweep_interval=args.sweep_interval)
+
+    analyzer = FaceAnalyzer(age_enabled=not args.no_age, emotion_enabled=not args.no_emotion,
+                            detector=detector, staged_emotion=args.staged_emotion,
+                            backend=backend, cache=cache)
+    if not analyzer.model_loaded:
+        print(analyzer.status_text, file=sys.stderr)
+        return 1
+
+    # Where fork is the default start method, pool workers inherit the models loaded above
+    executor = None
+    if args.face_workers > 0:
+        from parallel import FaceExecutor
+        executor = FaceExecutor(workers=args.face_workers, kind=args.executor,
+                                analyzer_options={'staged_emotion': args.staged_emotion}, preloaded=analyzer)
+        analyzer.executor = executor
+
+    analyze = None
+    tracker = None
+    if args.track_interval > 0:
+        from tracking import FaceTracker
+        tracker = FaceTracker(analyzer, detect_interval=args.track_interval)
+        analyze = tracker.update
+
+    # Adjusts resolution, cascade search and re-analysis interval to the budget
+    quality = None
+    if args.target_fps or args.target_latency:
+        from quality import QualityController
+        quality = QualityController(analyzer, target_fps=args.target_fps, target_latency_ms=args.target_latency,
+                                    analyze=analyze, tracker=tracker, log_path=args.quality_log)
+        analyze = quality.update
+
+    gate = None
+    if args.motion_gate:
+        from motion import MotionGate
+        gate = MotionGate(analyzer, analyze, min_changed=args.motion_sensitivity,
+                          refresh_interval=args.motion_refresh)
+        analyze = gate.update
+
+    sink = None
+    if args.results_log:
+        from results import ResultsSink
+        sink = ResultsSink(args.results_log)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    frame_count = 0
+    start = time.perf_counter()
+    try:
+        for record in analyzer.process(open_source(args.source), analyze=analyze):
+            out.write(json.dumps(record) + "\n")
+            if sink is not None:
+                sink.add(record['detections'], frame=record['frame_index'], source=args.source)
+            frame_count += 1
+    except IOError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if sink is not None:
+            sink.close()
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    fps = frame_count / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {frame_count} frames in {elapsed:.2f}s ({fps:.1f} fps)", file=sys.stderr)
+    if detector is not None:
+        for mode, cost in detector.summary().items():
+            print(f"  {mode}: {cost['calls']} calls, {cost['mean_ms']:.1f} ms mean", file=sys.stderr)
+    if quality is not None:
+        changes = [d for d in quality.decisions if d['from_level'] != d['to_level']]
+        print(f"Quality: level {quality.level} of {len(quality.levels) - 1}, {len(changes)} changes, "
+              f"{quality.average_ms or 0.0:.1f} ms average vs {quality.budget_ms:.1f} ms budget", file=sys.stderr)
+    if gate is not None:
+        print(f"Motion gate: skipped {gate.stats['skipped']} of {gate.stats['frames']} frames "
+              f"({gate.skip_ratio():.0%}), {gate.stats['forced']} forced refreshes", file=sys.stderr)
+    if cache is not None:
+        summary = cache.summary()
+        print(f"Face cache: {summary['hit_rate']:.0%} hit rate ({summary['hits']} hits, {summary['misses']} misses, "
+              f"{summary['expired']} expired, {summary['evictions']} evicted)", file=sys.stderr)
+    if analyzer.emotion_evaluator is not None:
+        report = analyzer.emotion_evaluator.report()
+        print(f"Staged emotion: {report['faces']} faces, {report['cascade_runs_saved']} cascade runs saved",
+              file=sys.stderr)
+        for stage, entry in report['stages'].items():
+            print(f"  {stage}: ran on {entry['hit_rate']:.0%} of faces, {entry['mean_ms']:.2f} ms mean",
+                  file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
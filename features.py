@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+from metrics import NULL_METRICS
+
+# Everything the age and emotion heuristics look at, one row per face
+FEATURE_DTYPE = np.dtype([
+    ('age_edge_density', np.float64),      # Canny(50, 150) edge density
+    ('emotion_edge_density', np.float64),  # Canny(30, 100) edge density
+    ('mean', np.float64),                  # mean grayscale brightness
+    ('std', np.float64),                   # grayscale contrast
+    ('eyes', np.int32),                    # eye cascade hits
+    ('smiles', np.int32),                  # smile cascade hits
+    ('emotion_ok', np.bool_),              # False when the emotion stage failed
+])
+
+# Upper bounds of the normalized edge density for each age bucket
+AGE_THRESHOLDS = np.array([0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7])
+
+# Emotion codes produced by classify_emotions, in rule order
+EMOTION_CODES = ['Happy', 'Surprise', 'Fear', 'Angry', 'Sad', 'Neutral']
+
+
+def _edge_density(face_gray, low, high, metrics=NULL_METRICS, buffers=None):
+    edges = buffers.get('edges', face_gray.shape) if buffers is not None else None
+    with metrics.stage('canny'):
+        edges = cv2.Canny(face_gray, low, high, edges=edges)
+    height, width = face_gray.shape
+    # Canny output is 0/255, so this equals np.sum(edges) without the full reduction
+    return cv2.countNonZero(edges) * 255 / (height * width)
+
+
+def brightness_stats(face_gray):
+    """Mean and (population) standard deviation, without np.std's full-size temporaries"""
+    mean, std = cv2.meanStdDev(face_gray)
+    return float(mean[0, 0]), float(std[0, 0])
+
+
+def extract_face_features(gray, faces, eye_cascade=None, smile_cascade=None, need_age=True, need_emotion=True,
+                          metrics=NULL_METRICS, buffers=None):
+    """Compute every per-face statistic once for all faces in a frame
+
+    Works on grayscale crops of the frame (age used to re-run cvtColor on
+    the BGR crop, which gives the same pixels). Fields that are not needed
+    are left at zero. With a buffers.BufferPool, Canny writes into a reused
+    scratch buffer.
+    """
+    features = np.zeros(len(faces), dtype=FEATURE_DTYPE)
+    for i, (x, y, w, h) in enumerate(faces):
+        face_gray = gray[y:y+h, x:x+w]
+        if face_gray.size == 0:
+            continue
+        if need_age:
+            features['age_edge_density'][i] = _edge_density(face_gray, 50, 150, metrics, buffers)
+        if need_emotion:
+            try:
+                with metrics.stage('eye_cascade'):
+                    features['eyes'][i] = len(eye_cascade.detectMultiScale(face_gray, 1.1, 3))
+                with metrics.stage('smile_cascade'):
+                    features['smiles'][i] = len(smile_cascade.detectMultiScale(face_gray, 1.8, 20))
+                features['emotion_edge_density'][i] = _edge_density(face_gray, 30, 100, metrics, buffers)
+                features['mean'][i], features['std'][i] = brightness_stats(face_gray)
+                features['emotion_ok'][i] = True
+            except cv2.error:
+                # Same fallback as detect_emotion_simple: classified as Neutral
+                features['emotion_ok'][i] = False
+    return features
+
+
+def classify_ages(features, age_list):
+    """Vectorized equivalent of FaceAnalyzer.estimate_age_simple's if-chain"""
+    normalized = np.minimum(features['age_edge_density'] / 50, 1.0)
+    buckets = np.searchsorted(AGE_THRESHOLDS, normalized, side='right')
+    return [age_list[b] for b in buckets]
+
+
+def classify_emotions(features):
+    """Vectorized equivalent of FaceAnalyzer.detect_emotion_simple's rules"""
+    edge_density = features['emotion_edge_density']
+    eyes_contrast = (features['eyes'] >= 2) & (features['std'] > 45)
+    codes = np.select(
+        [~features['emotion_ok'],
+         features['smiles'] > 0,
+         eyes_contrast & (edge_density > 0.15),
+         eyes_contrast,
+         edge_density > 0.2,
+         features['mean'] < 80],
+        [5, 0, 1, 2, 3, 4],
+        default=5)
+    return [EMOTION_CODES[c] for c in codes]
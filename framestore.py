@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+# Files making up a frame store directory
+FRAMES_FILE = "frames.npy"
+TIMESTAMPS_FILE = "timestamps.npy"
+META_FILE = "meta.json"
+
+
+def is_frame_store(path):
+    return isinstance(path, str) and os.path.isfile(os.path.join(path, META_FILE))
+
+
+class FrameStoreWriter:
+    """Append raw frames and their timestamps to a memory-mapped frame store
+
+    A store is a directory holding frames.npy, a fixed-shape uint8 array of
+    `capacity` frames created with np.lib.format.open_memmap, plus
+    timestamps.npy (seconds since the first frame) and meta.json with the
+    number of frames actually written. The frame size is fixed by the first
+    frame; frames of a different size are counted and skipped. Once
+    capacity is reached further frames are counted as dropped, so a
+    forgotten recording can't fill the disk. meta.json is rewritten every
+    meta_interval frames, so a session that is killed still replays (and
+    ReplayCapture recovers any frames written after the last update).
+    """
+
+    def __init__(self, path, capacity=1800, source=None, meta_interval=30):
+        if capacity <= 0:
+            raise ValueError("Frame store capacity must be positive")
+        self.path = path
+        self.capacity = capacity
+        self.source = source
+        self.meta_interval = meta_interval
+        self.frames = None
+        self.timestamps = None
+        self.count = 0
+        self.first_timestamp = None
+        self.started_at = None
+        self.stats = {'written': 0, 'dropped': 0, 'mismatched': 0}
+
+    def _create(self, shape):
+        os.makedirs(self.path, exist_ok=True)
+        self.frames = np.lib.format.open_memmap(os.path.join(self.path, FRAMES_FILE), mode="w+",
+                                                dtype=np.uint8, shape=(self.capacity,) + tuple(shape))
+        self.timestamps = np.lib.format.open_memmap(os.path.join(self.path, TIMESTAMPS_FILE), mode="w+",
+                                                    dtype=np.float64, shape=(self.capacity,))
+        self.started_at = time.time()
+        self._write_meta()
+
+    def append(self, frame, timestamp=None):
+        """Copy one frame into the store; returns False if it was not stored"""
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        if self.frames is None:
+            self._create(frame.shape)
+        if self.count >= self.capacity:
+            self.stats['dropped'] += 1
+            return False
+        if frame.shape != self.frames.shape[1:]:
+            self.stats['mismatched'] += 1
+            return False
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        np.copyto(self.frames[self.count], frame)
+        self.timestamps[self.count] = timestamp - self.first_timestamp
+        self.count += 1
+        self.stats['written'] += 1
+        if self.count % self.meta_interval == 0:
+            self._write_meta()
+        return True
+
+    def _write_meta(self):
+        meta = {
+            'count': self.count,
+            'capacity': self.capacity,
+            'shape': list(self.frames.shape[1:]),
+            'source': None if self.source is None else str(self.source),
+            'started_at': self.started_at
+        }
+        path = os.path.join(self.path, META_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        if self.frames is None:
+            return
+        self.frames.flush()
+        self.timestamps.flush()
+        self._write_meta()
+
+
+def recorded_count(timestamps, count=0):
+    """Frames in a store: meta.json's count, or more if the recording stopped before it was updated
+
+    Timestamps rise from 0 with every frame written (each is stored after
+    its frame) and the unwritten rest of the file is zeros, so the written
+    frames are the leading rising run. A lone first frame can't be told
+    apart from an empty store this way and is only counted via meta.json.
+    """
+    rising = np.diff(timestamps) > 0
+    run = int(rising.argmin()) if not rising.all() else len(rising)
+    return max(count, run + 1 if run else 0)
+
+
+class RecordingCapture:
+    """VideoCapture wrapper that saves every frame it reads to a frame store
+
+    Drop-in for the capture object the apps use: read(), isOpened(), get(),
+    set() and release() are passed through, and each successful read is
+    also appended to a FrameStoreWriter. release() finishes the store.
+    """
+
+    def __init__(self, cap, path, capacity=1800, source=None):
+        self.cap = cap
+        self.store = FrameStoreWriter(path, capacity=capacity, source=source)
+
+    def read(self, image=None):
+        ret, frame = self.cap.read(image)
+        if ret:
+            self.store.append(frame)
+        return ret, frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+        self.store.close()
+
+
+class ReplayCapture:
+    """Stand-in for cv2.VideoCapture that plays back a frame store
+
+    read() returns views straight into the memory-mapped file, so no frame
+    is decoded or copied. The map is copy-on-write: callers may draw on a
+    returned frame without touching the recording. Passing a buffer to
+    read(image) copies into it instead, like VideoCapture.read (unless the
+    buffer is itself a frame from this store, as when a caller recycles the
+    previous read, which stays zero-copy). Drawn-on
+    pages stay private to this mapping, so it is mapped afresh whenever
+    playback loops or seeks.
+
+    With realtime=True frames are released on the recorded timestamps
+    (scaled by speed); otherwise as fast as they are read. loop=True starts
+    over at the end instead of returning (False, None).
+    """
+
+    def __init__(self, path, realtime=True, speed=1.0, loop=False):
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.path = path
+        timestamps = np.load(os.path.join(path, TIMESTAMPS_FILE), mmap_mode="r")
+        self.count = recorded_count(timestamps, self.meta['count'])
+        self.frames = None
+        self._map()
+        self.timestamps = timestamps[:self.count]
+        self.realtime = realtime
+        self.speed = speed
+        self.loop = loop
+        self.position = 0
+        self.started = None
+        self.opened = self.count > 0
+
+    def _map(self):
+        self.frames = np.load(os.path.join(self.path, FRAMES_FILE), mmap_mode="c")[:self.count]
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        if self.position >= self.count:
+            if not self.loop:
+                return False, None
+            self.position = 0
+            self.started = None
+            self._map()
+
+        if self.realtime:
+            # Recorded offset of this frame relative to where playback (re)started
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = now - self.timestamps[self.position] / self.speed
+            delay = self.started + self.timestamps[self.position] / self.speed - now
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = self.frames[self.position]
+        self.position += 1
+        if image is not None and image.shape == frame.shape and not isinstance(image, np.memmap):
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def fps(self):
+        if self.count < 2 or self.timestamps[-1] <= 0:
+            return 0.0
+        return (self.count - 1) / float(self.timestamps[-1])
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.count)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps()
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.meta['shape'][1])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.meta['shape'][0])
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = min(max(0, int(value)), self.count)
+            self.started = None
+            self._map()
+            return True
+        return False
+
+    def release(self):
+        self.opened = False
+        self.frames = None
+        self.timestamps = None
+
+
+def open_capture(source, realtime=True):
+    """cv2.VideoCapture for cameras, files and URLs; ReplayCapture for a frame store directory"""
+    if is_frame_store(source):
+        return ReplayCapture(source, realtime=realtime)
+    return cv2.VideoCapture(source)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record raw camera frames to a frame store, or describe one")
+    parser.add_argument("store", help="frame store directory")
+    parser.add_argument("--source", help="record from this camera index or video file (omit to describe STORE)")
+    parser.add_argument("--seconds", type=float, default=30.0, help="how long to record")
+    parser.add_argument("--max-frames", type=int, default=1800, help="frames preallocated in the store")
+    args = parser.parse_args(argv)
+
+    if args.source is None:
+        try:
+            replay = ReplayCapture(args.store, realtime=False)
+        except (IOError, ValueError) as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        height, width = replay.meta['shape'][:2]
+        duration = float(replay.timestamps[-1]) if replay.count else 0.0
+        print(f"{replay.count} frames of {width}x{height}, {duration:.1f}s at {replay.fps():.1f} fps "
+              f"(capacity {replay.meta['capacity']}, source {replay.meta['source']})")
+        return 0
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"Could not open video source: {args.source}", file=sys.stderr)
+        return 1
+    recording = RecordingCapture(cap, args.store, capacity=args.max_frames, source=args.source)
+    buffer = None
+    end = time.perf_counter() + args.seconds
+    try:
+        while time.perf_counter() < end and recording.store.count < args.max_frames:
+            ret, buffer = recording.read(buffer)
+            if not ret:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recording.release()
+    print(f"Recorded {recording.store.count} frames to {args.store}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,212 @@
 import tkinter as tk
 from tkinter import messagebox
 import cv2
-from PIL import Image, ImageTk
-import os
-from datetime import datetime
-import numpy as np
+import sys
+import argparse
+import threading
+import time
+from face_analyzer import FaceAnalyzer
+from pipeline import FramePipeline
+from sharedframes import SharedFramePipeline
+from parallel import FaceExecutor
+from tracking import FaceTracker
+from detection import MultiResDetector
+from metrics import StageMetrics
+from display import DisplayBuffer
+from render import OverlayRenderer
+from capture import CaptureWriter, BurstCapture, VideoRecorder
+from cache import FaceCache
+from motion import MotionGate
+from results import ResultsSink
+from quality import QualityController
+from framestore import ReplayCapture, RecordingCapture
 
 class CameraApp:
-    def __init__(self, root):
+    def __init__(self, root, pipelined=False, face_workers=0, track_interval=0,
+                 detect_scale=1.0, sweep_interval=15, staged_emotion=False,
+                 show_metrics=False, metrics_file=None, metrics_port=None,
+                 burst_fps=10.0, burst_seconds=3.0, cache_size=0, cache_ttl=2.0,
+                 motion_gate=False, motion_sensitivity=0.002, motion_refresh=30, results_log=None,
+                 emotion_enabled=True, target_fps=None, quality_log=None, record_options=None,
+                 record_raw=False, replay=None, replay_realtime=True, record_session=None,
+                 session_frames=1800, analysis_processes=0):
+        self.started_at = time.perf_counter()
         self.root = root
+        self.pipeline = None
+        self.analyze_frame = None
+        self.last_sequence = 0
+        self.shown_errors = 0
+        self.last_metrics_dump = 0.0
+        self.cap = None
+        self.analyzer = None
+        self.executor = None
+        self.tracker = None
+        self.gate = None
+        self.quality = None
         self.root.title("Camera App with Age & Emotion Detection")
         self.root.geometry("1000x750")
         
-        # Initialize camera
-        self.cap = cv2.VideoCapture(0)
-        
-        if not self.cap.isOpened():
-            messagebox.showerror("Error", "Could not open camera")
-            root.destroy()
-            return
-        
-        # Load detection models
-        self.load_models()
+        # Hot-path stage timings (disabled hooks cost next to nothing)
+        self.show_metrics = show_metrics
+        self.metrics_file = metrics_file
+        self.metrics = StageMetrics(enabled=show_metrics or bool(metrics_file) or bool(metrics_port))
+        self.metrics_server = self.metrics.serve(metrics_port) if metrics_port else None
+        self.cache = FaceCache(max_entries=cache_size, ttl=cache_ttl) if cache_size > 0 else None
+        self.status_text = "⏳ Starting camera and loading detection models..."
         
         # Detection toggles
         self.age_detection_enabled = tk.BooleanVar(value=True)
-        self.emotion_detection_enabled = tk.BooleanVar(value=True)
+        self.emotion_detection_enabled = tk.BooleanVar(value=emotion_enabled)
         
         # Create GUI elements
         self.create_widgets()
         
-        # Start video feed
-        self.update_frame()
+        # Reused display buffers / PhotoImage and capture buffer for the synchronous loop; analysis
+        # only reads frames, and overlays are drawn by the renderer at display size or when saving
+        self.display = DisplayBuffer(max_width=700, max_height=500)
+        self.renderer = OverlayRenderer()
+        self.read_buffer = None
+        self.last_info_text = None
+        
+        # Optional compact log of every detection for later analytics
+        self.results = ResultsSink(results_log) if results_log else None
+        
+        # Captures are encoded and written on a background thread
+        self.writer = CaptureWriter("captures", renderer=self.renderer)
+        self.burst = BurstCapture(self.root, lambda: self.capture_photo(quiet=True),
+                                  fps=burst_fps, seconds=burst_seconds)
+        
+        # Continuous recording (toggled by the Record button); frames are encoded on the recorder's thread
+        self.recorder = None
+        self.record_options = record_options or {}
+        self.record_raw = record_raw
+        self.frame_counter = 0
+        self.current_frame = None
+        self.current_detections = []
+        self.last_captured_frame = None
+        self.last_reported_save = None
+        self.poll_writer()
+        
+        # Everything below needs the camera and models, which start in the background
+        self.options = {
+            'pipelined': pipelined, 'face_workers': face_workers, 'track_interval': track_interval,
+            'staged_emotion': staged_emotion, 'motion_gate': motion_gate,
+            'motion_sensitivity': motion_sensitivity, 'motion_refresh': motion_refresh,
+            'target_fps': target_fps, 'quality_log': quality_log, 'analysis_processes': analysis_processes
+        }
+        detector = None
+        self.detector_options = None
+        if detect_scale != 1.0:
+            self.detector_options = {'downscale': detect_scale, 'sweep_interval': sweep_interval}
+            detector = MultiResDetector(**self.detector_options)
+        
+        # Open the camera and load the cascades off the UI thread so the window appears right away;
+        # eye/smile cascades are only loaded now if emotion detection starts enabled
+        self.startup = {'window_ms': None, 'first_frame_ms': None}
+        self.camera_thread = threading.Thread(
+            target=self.open_camera, name="camera-open", daemon=True,
+            kwargs={'replay': replay, 'replay_realtime': replay_realtime, 'record_session': record_session,
+                    'session_frames': session_frames})
+        self.model_thread = threading.Thread(
+            target=self.load_analyzer, name="model-load", daemon=True,
+            kwargs={'detector': detector, 'emotion_enabled': emotion_enabled, 'staged_emotion': staged_emotion})
+        self.camera_thread.start()
+        self.model_thread.start()
+        self.root.after_idle(self.mark_window_shown)
+        self.root.after(20, self.poll_startup)
         
         # Handle window closing
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
-    def load_models(self):
-        """Load pre-trained models for face, age, and emotion detection"""
-        try:
-            # Age groups
-            self.age_list = ['(18-20)', '(24-26)', '(28-32)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
-            
-            # Emotion labels
-            self.emotion_list = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
-            
-            # Load face detection model (Haar Cascade)
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            
-            # Load additional cascade for better emotion detection features
-            self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-            self.smile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
-            
-            self.model_loaded = True
-            self.status_text = "Detection models loaded successfully"
-            
-        except Exception as e:
-            self.model_loaded = False
-            self.status_text = f"Error loading models: {str(e)}"
+    def open_camera(self, replay=None, replay_realtime=True, record_session=None, session_frames=1800):
+        start = time.perf_counter()
+        # A recorded frame store can stand in for the camera, and live frames can be saved to one
+        if replay:
+            try:
+                self.cap = ReplayCapture(replay, realtime=replay_realtime)
+            except (IOError, ValueError):
+                # Reported like a missing camera
+                self.cap = cv2.VideoCapture()
+        else:
+            self.cap = cv2.VideoCapture(0)
+        if record_session:
+            self.cap = RecordingCapture(self.cap, record_session, capacity=session_frames, source=replay or 0)
+        self.startup['camera_ms'] = (time.perf_counter() - start) * 1000.0
+    
+    def load_analyzer(self, detector, emotion_enabled, staged_emotion):
+        start = time.perf_counter()
+        self.analyzer = FaceAnalyzer(emotion_enabled=emotion_enabled, detector=detector,
+                                     staged_emotion=staged_emotion, metrics=self.metrics, cache=self.cache)
+        self.startup['models_ms'] = (time.perf_counter() - start) * 1000.0
+    
+    def mark_window_shown(self):
+        self.startup['window_ms'] = (time.perf_counter() - self.started_at) * 1000.0
+    
+    def poll_startup(self):
+        """Wait (without blocking Tk) for the background camera open and model load"""
+        if self.camera_thread.is_alive() or self.model_thread.is_alive():
+            self.root.after(20, self.poll_startup)
+            return
+        
+        if not self.cap.isOpened():
+            messagebox.showerror("Error", "Could not open camera")
+            self.on_closing()
+            return
+        self.status_text = self.analyzer.status_text
+        self.status_label.config(text=self.status_text)
+        self.finish_startup(**self.options)
+    
+    def finish_startup(self, pipelined, face_workers, track_interval, staged_emotion,
+                       motion_gate, motion_sensitivity, motion_refresh, target_fps, quality_log,
+                       analysis_processes):
+        # The display and writers draw the overlays, so analysis leaves frames untouched
+        self.analyzer.annotate = False
+        
+        # Optional per-face worker pool; spawned, since forking the Tk process is unsafe, so each
+        # worker loads its own cascades
+        if face_workers > 0:
+            self.executor = FaceExecutor(workers=face_workers, analyzer_options={'staged_emotion': staged_emotion},
+                                         start_method='spawn')
+            self.analyzer.executor = self.executor
+        
+        # Live feed step: full detection every frame, or tracking between detections
+        self.analyze_frame = self.analyzer.detect_faces_age_emotion
+        if track_interval > 0:
+            self.tracker = FaceTracker(self.analyzer, detect_interval=track_interval)
+            self.analyze_frame = self.tracker.update
+        
+        # Optionally trade detection quality for speed to hold a target frame rate
+        if target_fps:
+            self.quality = QualityController(self.analyzer, target_fps=target_fps, analyze=self.analyze_frame,
+                                             tracker=self.tracker, log_path=quality_log)
+            self.analyze_frame = self.quality.update
+        
+        # Optionally reuse the last detections while the scene is static
+        if motion_gate:
+            self.gate = MotionGate(self.analyzer, self.analyze_frame, min_changed=motion_sensitivity,
+                                   refresh_interval=motion_refresh)
+            self.analyze_frame = self.gate.update
+        
+        # Analysis processes: frames reach them through a shared-memory ring and only detections come
+        # back, so analysis doesn't compete with the UI for the GIL
+        if analysis_processes > 0:
+            self.pipeline = SharedFramePipeline(self.cap, workers=analysis_processes,
+                                                analyzer_options={'staged_emotion': staged_emotion},
+                                                detector_options=self.detector_options, metrics=self.metrics)
+            self.sync_toggles()
+            self.pipeline.start()
+        
+        # Pipelined mode: capture and analysis run on background threads
+        elif pipelined:
+            self.sync_toggles()
+            self.pipeline = FramePipeline(self.cap, self.analyze_frame, metrics=self.metrics, copy=False).start()
+        
+        # Start video feed
+        self.update_frame()
+        
+        # Periodic metrics overlay / dump
+        if self.metrics.enabled:
+            self.update_metrics()
     
     def create_widgets(self):
         # Main frame
@@ -117,6 +266,34 @@ class CameraApp:
         )
         self.capture_btn.pack(side=tk.LEFT, padx=10)
         
+        # Burst button
+        self.burst_btn = tk.Button(
+            button_frame,
+            text="🎞️ Burst",
+            command=self.start_burst,
+            font=("Arial", 14, "bold"),
+            bg="#2196F3",
+            fg="white",
+            padx=20,
+            pady=10,
+            relief=tk.RAISED
+        )
+        self.burst_btn.pack(side=tk.LEFT, padx=10)
+        
+        # Record button
+        self.record_btn = tk.Button(
+            button_frame,
+            text="⏺ Record",
+            command=self.toggle_recording,
+            font=("Arial", 14, "bold"),
+            bg="#9C27B0",
+            fg="white",
+            padx=20,
+            pady=10,
+            relief=tk.RAISED
+        )
+        self.record_btn.pack(side=tk.LEFT, padx=10)
+        
         # Quit button
         self.quit_btn = tk.Button(
             button_frame,
@@ -151,255 +328,329 @@ class CameraApp:
         # Status label
         self.status_label = tk.Label(main_frame, text=self.status_text, font=("Arial", 10))
         self.status_label.pack(pady=5)
+        
+        # Latency readout (pipelined mode only)
+        self.latency_label = tk.Label(main_frame, text="", font=("Arial", 9), fg="#555555")
+        self.latency_label.pack(pady=2)
+        
+        # Per-stage timings (--metrics only)
+        self.metrics_label = tk.Label(main_frame, text="", font=("Courier", 9), fg="#555555")
+        self.metrics_label.pack(pady=2)
     
-    def estimate_age_simple(self, face_roi):
-        """Simple age estimation based on face characteristics"""
-        # Convert to grayscale for analysis
-        gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
-        
-        # Calculate some basic features
-        height, width = gray_face.shape
-        
-        # Calculate edge density (more edges might indicate older age due to wrinkles)
-        edges = cv2.Canny(gray_face, 50, 150)
-        edge_density = np.sum(edges) / (height * width)
-        
-        # Normalize edge density
-        edge_density_norm = min(edge_density / 50, 1.0)
-        
-        # Simple age estimation based on edge density and face size
-        if edge_density_norm < 0.1:
-            return self.age_list[0]  # (0-2)
-        elif edge_density_norm < 0.2:
-            return self.age_list[1]  # (4-6)
-        elif edge_density_norm < 0.3:
-            return self.age_list[2]  # (8-12)
-        elif edge_density_norm < 0.4:
-            return self.age_list[3]  # (15-20)
-        elif edge_density_norm < 0.5:
-            return self.age_list[4]  # (25-32)
-        elif edge_density_norm < 0.6:
-            return self.age_list[5]  # (38-43)
-        elif edge_density_norm < 0.7:
-            return self.age_list[6]  # (48-53)
-        else:
-            return self.age_list[7]  # (60-100)
-    
-    def detect_emotion_simple(self, face_roi, face_gray):
-        """Simple emotion detection based on facial features"""
-        try:
-            # Detect eyes and smile within the face region
-            eyes = self.eye_cascade.detectMultiScale(face_gray, 1.1, 3)
-            smiles = self.smile_cascade.detectMultiScale(face_gray, 1.8, 20)
-            
-            # Calculate basic features for emotion estimation
-            height, width = face_gray.shape
-            
-            # Analyze brightness and contrast
-            mean_brightness = np.mean(face_gray)
-            brightness_std = np.std(face_gray)
-            
-            # Detect edges for expression analysis
-            edges = cv2.Canny(face_gray, 30, 100)
-            edge_density = np.sum(edges) / (height * width)
-            
-            # Simple heuristic-based emotion detection
-            if len(smiles) > 0:
-                # Strong smile detected
-                return 'Happy'
-            elif len(eyes) >= 2 and brightness_std > 45:
-                # Eyes detected with high contrast (possibly surprise/fear)
-                if edge_density > 0.15:
-                    return 'Surprise'
-                else:
-                    return 'Fear'
-            elif edge_density > 0.2:
-                # High edge density might indicate anger (furrowed brow)
-                return 'Angry'
-            elif mean_brightness < 80:
-                # Darker image might indicate sadness
-                return 'Sad'
-            elif edge_density < 0.05:
-                # Very smooth face might indicate neutral
-                return 'Neutral'
-            else:
-                # Default to neutral for ambiguous cases
-                return 'Neutral'
-                
-        except Exception as e:
-            return 'Neutral'
-    
-    def get_emotion_color(self, emotion):
-        """Get color for emotion label"""
-        color_map = {
-            'Happy': (0, 255, 0),      # Green
-            'Sad': (255, 0, 0),        # Blue
-            'Angry': (0, 0, 255),      # Red
-            'Surprise': (0, 255, 255), # Yellow
-            'Fear': (128, 0, 128),     # Purple
-            'Disgust': (0, 128, 128),  # Teal
-            'Neutral': (128, 128, 128) # Gray
-        }
-        return color_map.get(emotion, (255, 255, 255))
+    def sync_toggles(self):
+        """Copy the Tk toggles into the headless analyzer (UI thread only)"""
+        self.analyzer.age_enabled = self.age_detection_enabled.get()
+        self.analyzer.emotion_enabled = self.emotion_detection_enabled.get()
+        if isinstance(self.pipeline, SharedFramePipeline):
+            self.pipeline.set_toggles(self.analyzer.age_enabled, self.analyzer.emotion_enabled)
     
     def detect_faces_age_emotion(self, frame):
         """Detect faces and estimate ages and emotions"""
-        if not self.model_loaded:
-            return frame, []
-        
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-        
-        detection_results = []
-        
-        for (x, y, w, h) in faces:
-            # Draw rectangle around face
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-            
-            # Extract face ROI
-            face_roi = frame[y:y+h, x:x+w]
-            face_gray = gray[y:y+h, x:x+w]
-            
-            if face_roi.size > 0:
-                estimated_age = None
-                estimated_emotion = None
-                
-                # Estimate age if enabled
-                if self.age_detection_enabled.get():
-                    estimated_age = self.estimate_age_simple(face_roi)
-                
-                # Detect emotion if enabled
-                if self.emotion_detection_enabled.get():
-                    estimated_emotion = self.detect_emotion_simple(face_roi, face_gray)
-                
-                # Prepare label text
-                label_parts = []
-                if estimated_age:
-                    label_parts.append(f'Age: {estimated_age}')
-                if estimated_emotion:
-                    label_parts.append(f'Emotion: {estimated_emotion}')
-                
-                # Draw labels
-                y_offset = y - 10
-                for i, label in enumerate(label_parts):
-                    color = (0, 255, 0)  # Default green
-                    if 'Emotion:' in label and estimated_emotion:
-                        color = self.get_emotion_color(estimated_emotion)
-                    
-                    cv2.putText(frame, label, (x, y_offset - (i * 25)), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-                
-                detection_results.append({
-                    'position': (x, y, w, h),
-                    'age': estimated_age,
-                    'emotion': estimated_emotion
-                })
-        
-        return frame, detection_results
+        self.sync_toggles()
+        return self.analyzer.detect_faces_age_emotion(frame)
     
     def update_frame(self):
-        ret, frame = self.cap.read()
+        if self.pipeline is not None:
+            self.update_frame_pipelined()
+            return
+        
+        with self.metrics.stage('cap_read'):
+            ret, frame = self.cap.read(self.read_buffer)
         
         if ret:
-            # Apply face, age, and emotion detection
-            processed_frame, detections = self.detect_faces_age_emotion(frame.copy())
-            
-            # Update detection info
-            if detections:
-                info_text = f"🎯 Detected {len(detections)} face(s):\n\n"
-                for i, detection in enumerate(detections):
-                    info_text += f"👤 Face {i+1}:\n"
-                    if detection['age']:
-                        info_text += f"   🎂 Age: {detection['age']}\n"
-                    if detection['emotion']:
-                        info_text += f"   😊 Emotion: {detection['emotion']}\n"
-                    info_text += "\n"
-                self.detection_info.config(text=info_text.strip())
-            else:
-                active_detections = []
-                if self.age_detection_enabled.get():
-                    active_detections.append("age")
-                if self.emotion_detection_enabled.get():
-                    active_detections.append("emotion")
-                
-                if active_detections:
-                    self.detection_info.config(text=f"No faces detected\n({' & '.join(active_detections)} detection active)")
-                else:
-                    self.detection_info.config(text="All detection disabled")
-            
-            # Convert frame from BGR to RGB
-            frame_rgb = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
-            
-            # Resize frame to fit in window
-            height, width = frame_rgb.shape[:2]
-            max_width, max_height = 700, 500
-            
-            if width > max_width or height > max_height:
-                scale = min(max_width/width, max_height/height)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                frame_rgb = cv2.resize(frame_rgb, (new_width, new_height))
-            
-            # Convert to PIL Image and then to PhotoImage
-            pil_image = Image.fromarray(frame_rgb)
-            photo = ImageTk.PhotoImage(pil_image)
+            # Reuse the capture buffer next tick; analysis reads it without drawing on it
+            self.read_buffer = frame
             
-            # Update label with new frame
-            self.video_label.config(image=photo)
-            self.video_label.image = photo  # Keep a reference
-            
-            # Store current frame for capture
-            self.current_frame = frame
+            # Apply face, age, and emotion detection
+            self.sync_toggles()
+            _, detections = self.analyze_frame(frame)
+            self.show_results(frame, detections)
         
         # Schedule next frame update
         self.root.after(10, self.update_frame)
     
-    def capture_photo(self):
-        if hasattr(self, 'current_frame'):
-            # Create captures directory if it doesn't exist
-            if not os.path.exists("captures"):
-                os.makedirs("captures")
-            
-            # Apply detection to the captured frame
-            processed_frame, detections = self.detect_faces_age_emotion(self.current_frame.copy())
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"captures/photo_{timestamp}.jpg"
+    def update_frame_pipelined(self):
+        # Toggles are read here, on the UI thread, and picked up by the worker
+        self.sync_toggles()
+        
+        # Show the newest finished result, if there is one we haven't shown yet
+        result = self.pipeline.latest_result(self.last_sequence)
+        if result is not None:
+            self.last_sequence = result['sequence']
+            self.show_results(result['frame'], result['detections'])
+            self.pipeline.mark_displayed(result)
+        
+        # Counters refresh with each new result, and also while analysis keeps failing
+        if result is not None or self.pipeline.errors != self.shown_errors:
+            self.shown_errors = self.pipeline.errors
+            stats = self.pipeline.stats()
+            text = (f"Latency: {stats['mean_ms']:.0f} ms (p95 {stats['p95_ms']:.0f} ms) | "
+                    f"analyzed {stats['analyzed']} / captured {stats['captured']}, dropped {stats['dropped']} | "
+                    f"display skipped {self.display.skipped}")
+            if stats['errors']:
+                text += f" | {stats['errors']} analysis errors, last: {stats['last_error']}"
+            self.latency_label.config(text=text)
+        
+        # Schedule next frame update
+        self.root.after(10, self.update_frame)
+    
+    def show_results(self, frame, detections):
+        if self.startup['first_frame_ms'] is None:
+            self.report_startup()
+        
+        if self.results is not None:
+            self.results.add(detections, frame=self.frame_counter)
+        
+        # The recorder draws overlays on its own thread, unless raw frames were asked for
+        if self.recorder is not None:
+            self.recorder.submit(frame, detections)
+        
+        # Update detection info
+        if detections:
+            info_text = f"🎯 Detected {len(detections)} face(s):\n\n"
+            for i, detection in enumerate(detections):
+                info_text += f"👤 Face {detection.get('track_id', i+1)}:\n"
+                if detection['age']:
+                    info_text += f"   🎂 Age: {detection['age']}\n"
+                if detection['emotion']:
+                    info_text += f"   😊 Emotion: {detection['emotion']}\n"
+                info_text += "\n"
+            info_text = info_text.strip()
+        else:
+            active_detections = []
+            if self.age_detection_enabled.get():
+                active_detections.append("age")
+            if self.emotion_detection_enabled.get():
+                active_detections.append("emotion")
             
-            # Save the photo with detections
-            cv2.imwrite(filename, processed_frame)
+            if active_detections:
+                info_text = f"No faces detected\n({' & '.join(active_detections)} detection active)"
+            else:
+                info_text = "All detection disabled"
+        
+        # Only touch the label when the text actually changes
+        if info_text != self.last_info_text:
+            self.detection_info.config(text=info_text)
+            self.last_info_text = info_text
+        
+        # Resize, convert and paste into the persistent PhotoImage, unless the UI is falling behind
+        if self.display.should_display():
+            with self.metrics.stage('display'):
+                self.display.show(self.video_label, frame, detections, self.renderer)
+        
+        # Store current frame and its detections for capture
+        self.current_frame = frame
+        self.current_detections = detections
+        self.frame_counter += 1
+    
+    def update_metrics(self):
+        if self.show_metrics:
+            status = self.metrics.status_line()
+            if self.cache is not None:
+                status += f" | cache hits {self.cache.hit_rate():.0%}"
+            if self.gate is not None:
+                status += f" | motion skipped {self.gate.skip_ratio():.0%}"
+            if self.quality is not None:
+                status += f" | {self.quality.status()}"
+            self.metrics_label.config(text=status)
+        
+        # Dump to file every few seconds
+        now = time.time()
+        if self.metrics_file and now - self.last_metrics_dump >= 5.0:
+            self.metrics.dump(self.metrics_file)
+            self.last_metrics_dump = now
+        
+        self.root.after(500, self.update_metrics)
+    
+    def capture_photo(self, quiet=False):
+        """Queue the current annotated frame for saving; returns True if a new frame was queued"""
+        if self.current_frame is None:
+            if not quiet:
+                messagebox.showerror("Error", "No frame available to capture")
+            return False
+        
+        # Bursts only save frames that haven't been captured already
+        if quiet and self.frame_counter == self.last_captured_frame:
+            return False
+        self.last_captured_frame = self.frame_counter
+        
+        # The writer thread draws this frame's detections onto the copy, then encodes and saves it
+        filename = self.writer.submit(self.current_frame.copy(), self.current_detections)
+        if filename is None:
+            self.status_label.config(text=f"⚠️ Capture dropped: writer busy ({self.writer.pending()} pending)")
+            return False
+        
+        if not quiet:
+            self.status_label.config(text=f"📸 Saving {filename}...")
+        return True
+    
+    def toggle_recording(self):
+        if self.recorder is None:
+            try:
+                self.recorder = VideoRecorder(renderer=None if self.record_raw else self.renderer,
+                                              **self.record_options)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self.record_btn.config(text="⏹ Stop")
+            self.status_label.config(text=f"⏺ Recording to {self.recorder.directory}/")
+            return
+        
+        # Finishing the queue and the last segment happens off the UI thread
+        recorder, self.recorder = self.recorder, None
+        threading.Thread(target=recorder.close, name="recorder-close", daemon=True).start()
+        self.record_btn.config(text="⏺ Record")
+        self.status_label.config(text=f"⏹ Recorded {recorder.stats['queued']} frames "
+                                      f"({recorder.stats['dropped']} dropped) in {recorder.directory}/")
+    
+    def start_burst(self):
+        self.burst.start()
+        self.status_label.config(text=f"🎞️ Burst: {self.burst.total} frames at {self.burst.fps:g} fps")
+    
+    def poll_writer(self):
+        # Report finished writes from the writer thread on the UI thread
+        saved = self.writer.last_saved
+        if saved is not None and saved is not self.last_reported_save:
+            self.last_reported_save = saved
+            filename, detections = saved
             
             # Create info text for the capture
             if detections:
-                info_text = f"📸 Captured photo with {len(detections)} face(s) detected:\n"
+                info_parts = []
                 for i, detection in enumerate(detections):
-                    info_parts = []
+                    face_parts = []
                     if detection['age']:
-                        info_parts.append(f"Age: {detection['age']}")
+                        face_parts.append(f"Age: {detection['age']}")
                     if detection['emotion']:
-                        info_parts.append(f"Emotion: {detection['emotion']}")
-                    if info_parts:
-                        info_text += f"Face {i+1}: {', '.join(info_parts)}\n"
+                        face_parts.append(f"Emotion: {detection['emotion']}")
+                    if face_parts:
+                        info_parts.append(f"Face {i+1}: {', '.join(face_parts)}")
+                info_text = f"{len(detections)} face(s) - " + "; ".join(info_parts)
             else:
-                info_text = "📸 Photo captured (no faces detected)"
+                info_text = "no faces detected"
             
-            # Update status
-            self.status_label.config(text=f"Photo saved: {filename}")
-            
-            # Show success message with detection info
-            messagebox.showinfo("Photo Captured", f"{info_text}\n📁 Saved as: {filename}")
-        else:
-            messagebox.showerror("Error", "No frame available to capture")
+            status = f"📁 Photo saved: {filename} ({info_text})"
+            if self.burst.running or self.burst.taken:
+                status += f" | burst {self.burst.taken}/{self.burst.total}"
+            if self.writer.stats['dropped']:
+                status += f" | {self.writer.stats['dropped']} dropped"
+            self.status_label.config(text=status)
+        elif self.writer.last_error is not None:
+            self.status_label.config(text=f"⚠️ {self.writer.last_error}")
+            self.writer.last_error = None
+        
+        # Recording counters on the Record button
+        if self.recorder is not None:
+            stats = self.recorder.stats
+            self.record_btn.config(text=f"⏹ Stop ({stats['written']} frames, {stats['dropped']} dropped)")
+            if self.recorder.last_error is not None:
+                self.status_label.config(text=f"⚠️ Recording: {self.recorder.last_error}")
+                self.recorder.last_error = None
+        
+        self.root.after(200, self.poll_writer)
+    
+    def report_startup(self):
+        self.startup['first_frame_ms'] = (time.perf_counter() - self.started_at) * 1000.0
+        report = ", ".join(f"{name[:-3].replace('_', ' ')} {value:.0f} ms"
+                           for name, value in self.startup.items() if value is not None)
+        print(f"Startup: {report}", file=sys.stderr)
     
     def on_closing(self):
+        # Stop background threads before releasing the camera they read from
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if getattr(self, 'executor', None) is not None:
+            self.executor.shutdown()
+        if getattr(self, 'writer', None) is not None:
+            self.burst.stop()
+            self.writer.close()
+        if getattr(self, 'recorder', None) is not None:
+            self.recorder.close()
+        if getattr(self, 'results', None) is not None:
+            self.results.close()
+        if getattr(self, 'metrics_file', None):
+            self.metrics.dump(self.metrics_file)
+        if getattr(self, 'metrics_server', None) is not None:
+            self.metrics_server.shutdown()
+        
         # Release camera and close window
-        if hasattr(self, 'cap'):
+        if getattr(self, 'cap', None) is not None:
             self.cap.release()
         self.root.destroy()
 
 # Create and run the application
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Camera App with Age & Emotion Detection")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="run capture and analysis on background threads")
+    parser.add_argument("--analysis-processes", type=int, default=0,
+                        help="analyze frames in this many worker processes fed through shared memory "
+                             "(tracking, motion gate, target fps and face workers only apply in-process)")
+    parser.add_argument("--face-workers", type=int, default=0,
+                        help="analyze faces on a process pool of this many workers")
+    parser.add_argument("--track-interval", type=int, default=0,
+                        help="track faces and run full detection only every N frames")
+    parser.add_argument("--detect-scale", type=float, default=1.0,
+                        help="run the face cascade on a frame downscaled by this factor")
+    parser.add_argument("--sweep-interval", type=int, default=15,
+                        help="full-frame sweep every N frames with --detect-scale")
+    parser.add_argument("--staged-emotion", action="store_true",
+                        help="evaluate emotion rules lazily with half-face eye/smile searches")
+    parser.add_argument("--no-emotion", action="store_true",
+                        help="start with emotion detection off (its cascades load when it is first enabled)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="show per-stage timings under the video")
+    parser.add_argument("--metrics-file", help="periodically dump per-stage timings to this JSON file")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve per-stage timings as JSON on http://127.0.0.1:PORT/")
+    parser.add_argument("--burst-fps", type=float, default=10.0, help="burst capture rate")
+    parser.add_argument("--burst-seconds", type=float, default=3.0, help="burst capture duration")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="memoize age/emotion for up to N near-identical face crops (0 = off)")
+    parser.add_argument("--cache-ttl", type=float, default=2.0, help="seconds a cached face result stays valid")
+    parser.add_argument("--results-log", help="append every detection to a compact binary log in this directory")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="skip analysis and reuse the last detections while the scene is static")
+    parser.add_argument("--motion-sensitivity", type=float, default=0.002,
+                        help="fraction of low-res pixels that must change to count as motion")
+    parser.add_argument("--motion-refresh", type=int, default=30,
+                        help="force a full analysis at least every N frames with --motion-gate")
+    parser.add_argument("--target-fps", type=float,
+                        help="lower detection quality as needed to keep analysis at this frame rate")
+    parser.add_argument("--quality-log", help="append the quality controller's decisions to this JSON lines file")
+    parser.add_argument("--record-dir", default="recordings", help="where the Record button writes video segments")
+    parser.add_argument("--record-codec", default="MJPG", help="four-character codec for recordings")
+    parser.add_argument("--record-ext", default=".avi", help="container extension matching --record-codec")
+    parser.add_argument("--record-fps", type=float, default=20.0, help="frame rate written into recordings")
+    parser.add_argument("--record-segment", type=float, default=300.0,
+                        help="start a new recording file every N seconds of video (0 = one file)")
+    parser.add_argument("--record-queue", type=int, default=64,
+                        help="frames waiting for the encoder before the oldest are dropped")
+    parser.add_argument("--record-raw", action="store_true",
+                        help="record frames without overlays (detections are saved alongside for re-rendering)")
+    parser.add_argument("--replay", help="play back a frame store (see framestore.py) instead of the camera")
+    parser.add_argument("--replay-fast", action="store_true",
+                        help="with --replay, deliver frames as fast as they are read instead of at recorded timing")
+    parser.add_argument("--record-session", help="save every raw camera frame to this frame store directory")
+    parser.add_argument("--session-frames", type=int, default=1800,
+                        help="frames preallocated for --record-session")
+    args = parser.parse_args()
+    
     root = tk.Tk()
-    app = CameraApp(root)
+    app = CameraApp(root, pipelined=args.pipelined, face_workers=args.face_workers,
+                    track_interval=args.track_interval, detect_scale=args.detect_scale,
+                    sweep_interval=args.sweep_interval, staged_emotion=args.staged_emotion,
+                    show_metrics=args.metrics, metrics_file=args.metrics_file,
+                    metrics_port=args.metrics_port, burst_fps=args.burst_fps,
+                    burst_seconds=args.burst_seconds, cache_size=args.cache_size,
+                    cache_ttl=args.cache_ttl, motion_gate=args.motion_gate,
+                    motion_sensitivity=args.motion_sensitivity, motion_refresh=args.motion_refresh,
+                    results_log=args.results_log, emotion_enabled=not args.no_emotion,
+                    target_fps=args.target_fps, quality_log=args.quality_log,
+                    record_options={'directory': args.record_dir, 'codec': args.record_codec,
+                                    'extension': args.record_ext, 'fps': args.record_fps,
+                                    'segment_seconds': args.record_segment, 'max_pending': args.record_queue},
+                    record_raw=args.record_raw, replay=args.replay, replay_realtime=not args.replay_fast,
+                    record_session=args.record_session, session_frames=args.session_frames,
+                    analysis_processes=args.analysis_processes)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Short names for the on-screen status line
+STAGE_LABELS = {
+    'cap_read': 'read',
+    'grayscale': 'gray',
+    'face_cascade': 'face',
+    'eye_cascade': 'eyes',
+    'smile_cascade': 'smile',
+    'canny': 'canny',
+    'dnn_face': 'dnn face',
+    'dnn_age': 'dnn age',
+    'dnn_emotion': 'dnn emo',
+    'overlay': 'text',
+    'display': 'display'
+}
+
+
+class _NullStage:
+    """Shared do-nothing context manager handed out while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageMetrics:
+    """Rolling per-stage timings for the hot path
+
+    Wrap a stage with `with metrics.stage('face_cascade'): ...`. While
+    disabled, stage() returns a shared no-op context manager, so the hooks
+    cost one attribute check and an empty with-block. Each stage keeps its
+    last `window` samples for rolling statistics plus lifetime totals.
+    """
+
+    def __init__(self, enabled=False, window=120):
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}
+        self.totals = {}
+        self.started = time.time()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples.setdefault(name, deque(maxlen=self.window))
+            self.totals.setdefault(name, [0, 0.0])
+        samples.append(seconds)
+        total = self.totals[name]
+        total[0] += 1
+        total[1] += seconds
+
+    def reset(self):
+        self.samples = {}
+        self.totals = {}
+        self.started = time.time()
+
+    def summary(self):
+        """Rolling mean/p95/last plus lifetime count/total per stage, in milliseconds"""
+        summary = {}
+        for name, samples in list(self.samples.items()):
+            values = np.array(list(samples)) * 1000.0
+            if values.size == 0:
+                continue
+            count, total = self.totals[name]
+            summary[name] = {
+                'last_ms': float(values[-1]),
+                'mean_ms': float(values.mean()),
+                'p95_ms': float(np.percentile(values, 95)),
+                'count': count,
+                'total_ms': total * 1000.0
+            }
+        return summary
+
+    def status_line(self):
+        """One-line rolling mean per stage for the Tk status bar"""
+        parts = [f"{STAGE_LABELS.get(name, name)} {entry['mean_ms']:.1f}"
+                 for name, entry in self.summary().items()]
+        return "Stage ms: " + " | ".join(parts) if parts else "Stage ms: (no samples yet)"
+
+    def snapshot(self):
+        return {'started': self.started, 'time': time.time(), 'stages': self.summary()}
+
+    def dump(self, path):
+        """Write the current snapshot to a JSON file"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def serve(self, port=9100, host="127.0.0.1"):
+        """Serve the snapshot as JSON over HTTP on a background thread; returns the server"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(metrics.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+# Shared disabled instance used when no metrics are configured
+NULL_METRICS = StageMetrics(enabled=False)
@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Skip face analysis while the scene isn't changing
+
+    Each frame is shrunk to `width` pixels wide, converted to grayscale and
+    lightly blurred, then compared with the frame that was last analyzed
+    (not just the previous frame, so slow drift still adds up). The frame
+    counts as changed when more than min_changed of its pixels differ by
+    more than pixel_threshold grey levels. Static frames reuse the last
+    detections, redrawn onto the new frame, and skip the cascades; every
+    refresh_interval frames an analysis is forced regardless.
+
+    update() has the same contract as FaceAnalyzer.detect_faces_age_emotion,
+    so it can wrap it (or FaceTracker.update) via analyze. Callers that
+    schedule analysis themselves can pass analyzer=None and use changed()
+    and redraw() directly.
+    """
+
+    def __init__(self, analyzer, analyze=None, width=80, pixel_threshold=20, min_changed=0.002,
+                 refresh_interval=30):
+        self.analyzer = analyzer
+        if analyze is None and analyzer is not None:
+            analyze = analyzer.detect_faces_age_emotion
+        self.analyze = analyze
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.refresh_interval = refresh_interval
+
+        self.reference = None
+        self.detections = []
+        self.frames_since_analysis = 0
+        self.last_change = 0.0
+        self.stats = {'frames': 0, 'analyzed': 0, 'skipped': 0, 'forced': 0}
+
+    def reset(self):
+        self.reference = None
+        self.detections = []
+
+    def _small(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(round(height * self.width / width))))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def changed(self, frame):
+        """True if frame needs a full analysis; counts the decision either way"""
+        self.stats['frames'] += 1
+        small = self._small(frame)
+
+        if self.reference is None or self.reference.shape != small.shape:
+            changed = True
+            self.last_change = 1.0
+        else:
+            diff = cv2.absdiff(small, self.reference)
+            self.last_change = np.count_nonzero(diff > self.pixel_threshold) / float(diff.size)
+            changed = self.last_change > self.min_changed
+
+        if not changed and self.frames_since_analysis >= self.refresh_interval - 1:
+            changed = True
+            self.stats['forced'] += 1
+
+        if changed:
+            self.reference = small
+            self.frames_since_analysis = 0
+            self.stats['analyzed'] += 1
+        else:
+            self.frames_since_analysis += 1
+            self.stats['skipped'] += 1
+        return changed
+
+    def redraw(self, frame, detections, analyzer=None):
+        """Draw previous detections onto a new frame"""
+        analyzer = analyzer or self.analyzer
+        return analyzer.renderer.draw(frame, detections)
+
+    def update(self, frame):
+        if self.changed(frame):
+            frame, self.detections = self.analyze(frame)
+            return frame, self.detections
+        if self.analyzer.annotate:
+            with self.analyzer.metrics.stage('overlay'):
+                self.redraw(frame, self.detections)
+        return frame, self.detections
+
+    def skip_ratio(self):
+        """Fraction of frames whose analysis was skipped"""
+        return self.stats['skipped'] / self.stats['frames'] if self.stats['frames'] else 0.0
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+# Per-process analyzer (and optional tracker), created once by the pool initializer
+_worker = {}
+
+PLAN_FILE = "plan.json"
+
+
+class ChunkFailed(Exception):
+    """Raised by OfflineJob.run when a chunk fails in its worker (the worker's error is the cause)"""
+
+    def __init__(self, index, first, last, error):
+        super().__init__(f"Chunk {index} (frames {first}-{last - 1}) failed: {type(error).__name__}: {error}")
+        self.index = index
+        self.first = first
+        self.last = last
+
+
+def _init_worker(options, track_interval):
+    # One OpenCV thread per process: the chunks themselves are the parallelism
+    cv2.setNumThreads(1)
+    from face_analyzer import FaceAnalyzer
+    _worker['analyzer'] = FaceAnalyzer(**options)
+    _worker['track_interval'] = track_interval
+
+
+def _frames_in_range(cap, start, end):
+    for _ in range(start, end):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+
+
+def process_chunk(video, index, start, end, path):
+    """Analyze frames [start, end) of video into path; returns (index, frames, seconds)"""
+    began = time.perf_counter()
+    analyzer = _worker['analyzer']
+    analyze = None
+    if _worker['track_interval'] > 0:
+        from tracking import FaceTracker
+        analyze = FaceTracker(analyzer, detect_interval=_worker['track_interval']).update
+
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video source: {video}")
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    # Written under a temporary name so an interrupted chunk is never mistaken for a finished one
+    frames = 0
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as out:
+            for record in analyzer.process(_frames_in_range(cap, start, end), analyze=analyze):
+                record['frame_index'] += start
+                out.write(json.dumps(record) + "\n")
+                frames += 1
+    finally:
+        cap.release()
+    os.replace(path + ".tmp", path)
+    return index, frames, time.perf_counter() - began
+
+
+class OfflineJob:
+    """Split a video file into frame ranges and analyze them on a process pool
+
+    Each worker process seeks to its range with CAP_PROP_POS_FRAMES and
+    writes the range's records to its own file in work_dir. Finished
+    ranges are kept across runs, so an interrupted job resumes where it
+    stopped (as long as the video and settings are unchanged); merge()
+    then concatenates the ranges in frame order.
+    """
+
+    def __init__(self, video, work_dir, chunk_frames=900, workers=None, analyzer_options=None, track_interval=0):
+        self.video = video
+        self.work_dir = work_dir
+        self.chunk_frames = chunk_frames
+        self.workers = workers or os.cpu_count() or 1
+        self.analyzer_options = dict(analyzer_options or {})
+        self.track_interval = track_interval
+
+        cap = cv2.VideoCapture(video)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video source: {video}")
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if self.total_frames <= 0:
+            raise IOError(f"Cannot split {video}: frame count unknown (not a seekable file?)")
+
+        self.chunks = [(index, start, min(start + chunk_frames, self.total_frames))
+                       for index, start in enumerate(range(0, self.total_frames, chunk_frames))]
+        self._prepare_work_dir()
+
+    def _plan(self):
+        stat = os.stat(self.video)
+        return {
+            'video': os.path.abspath(self.video),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'total_frames': self.total_frames,
+            'chunk_frames': self.chunk_frames,
+            'analyzer_options': self.analyzer_options,
+            'track_interval': self.track_interval
+        }
+
+    def _prepare_work_dir(self):
+        plan = self._plan()
+        path = os.path.join(self.work_dir, PLAN_FILE)
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                if json.load(f) != plan:
+                    raise ValueError(f"{self.work_dir} belongs to a different video or settings; "
+                                     "remove it or use --restart")
+        else:
+            os.makedirs(self.work_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(plan, f, indent=2)
+
+    def chunk_path(self, index):
+        return os.path.join(self.work_dir, f"chunk_{index:06d}.jsonl")
+
+    def pending(self):
+        return [chunk for chunk in self.chunks if not os.path.isfile(self.chunk_path(chunk[0]))]
+
+    def run(self, progress=None):
+        """Analyze all unfinished chunks; progress(done, total, frames, seconds) is called per chunk"""
+        pending = self.pending()
+        done = len(self.chunks) - len(pending)
+        frames = 0
+        start = time.perf_counter()
+        if not pending:
+            return frames, 0.0
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)), initializer=_init_worker,
+                                 initargs=(self.analyzer_options, self.track_interval)) as pool:
+            futures = {pool.submit(process_chunk, self.video, index, first, last, self.chunk_path(index)):
+                       (index, first, last) for index, first, last in pending}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        _, chunk_frames, _ = future.result()
+                    except Exception as e:
+                        raise ChunkFailed(*futures[future], e) from e
+                    done += 1
+                    frames += chunk_frames
+                    if progress is not None:
+                        progress(done, len(self.chunks), frames, time.perf_counter() - start)
+            except BaseException:
+                # Interrupted or failed: drop queued chunks; finished ones stay on disk for the next run
+                for future in futures:
+                    future.cancel()
+                raise
+        return frames, time.perf_counter() - start
+
+    def merge(self, output):
+        """Concatenate finished chunks, in frame order, into output"""
+        missing = self.pending()
+        if missing:
+            raise IOError(f"{len(missing)} chunks are not finished yet")
+        with open(output, "w", encoding="utf-8") as out:
+            for index, _, _ in self.chunks:
+                with open(self.chunk_path(index), encoding="utf-8") as f:
+                    shutil.copyfileobj(f, out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a long video file in parallel chunks")
+    parser.add_argument("video", help="video file to analyze")
+    parser.add_argument("--output", required=True, help="merged JSON lines output, in frame order")
+    parser.add_argument("--work-dir", help="where finished chunks are kept for resuming (default: OUTPUT.parts)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunk-frames", type=int, default=900, help="frames per chunk")
+    parser.add_argument("--restart", action="store_true", help="discard finished chunks from an earlier run")
+    parser.add_argument("--keep-parts", action="store_true", help="keep the chunk files after merging")
+    parser.add_argument("--no-age", action="store_true", help="disable age estimation")
+    parser.add_argument("--no-emotion", action="store_true", help="disable emotion detection")
+    parser.add_argument("--staged-emotion", action="store_true",
+                        help="evaluate emotion rules lazily, searching eyes/smiles in half-face regions")
+    parser.add_argument("--track-interval", type=int, default=0,
+                        help="track faces and run full detection only every N frames (per chunk)")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or args.output + ".parts"
+    if args.restart and os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+
+    options = {'age_enabled': not args.no_age, 'emotion_enabled': not args.no_emotion,
+               'staged_emotion': args.staged_emotion}
+    try:
+        job = OfflineJob(args.video, work_dir, chunk_frames=args.chunk_frames, workers=args.workers,
+                         analyzer_options=options, track_interval=args.track_interval)
+    except (IOError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    finished = len(job.chunks) - len(job.pending())
+    print(f"{job.total_frames} frames in {len(job.chunks)} chunks, {finished} already done; "
+          f"{job.workers} workers", file=sys.stderr)
+
+    def progress(done, total, frames, seconds):
+        fps = frames / seconds if seconds > 0 else 0.0
+        print(f"[{done:>4}/{total}] {done / total:6.1%}  {frames} frames this run, {fps:.1f} fps", file=sys.stderr)
+
+    try:
+        frames, seconds = job.run(progress)
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun the same command to resume from {work_dir}", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        print(f"Rerun the same command to resume from {work_dir}", file=sys.stderr)
+        return 1
+
+    job.merge(args.output)
+    if not args.keep_parts:
+        shutil.rmtree(work_dir)
+    fps = frames / seconds if seconds > 0 else 0.0
+    print(f"Processed {frames} frames in {seconds:.2f}s ({fps:.1f} fps) -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
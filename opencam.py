@@ -1,27 +1,46 @@
+import argparse
 import tkinter as tk
 from tkinter import messagebox
 import cv2
 from PIL import Image, ImageTk
-import os
-from datetime import datetime
-import numpy as np
+from face_analyzer import FaceAnalyzer
+from capture import CaptureWriter
+from render import OverlayRenderer
+from framestore import ReplayCapture, RecordingCapture
+
+# Age groups
+AGE_LIST = ['(0-2)', '(4-6)', '(8-12)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
 
 class CameraApp:
-    def __init__(self, root):
+    def __init__(self, root, replay=None, replay_realtime=True, record_session=None, session_frames=1800):
         self.root = root
         self.root.title("Camera App with Age Detection")
         self.root.geometry("900x700")
         
-        # Initialize camera
-        self.cap = cv2.VideoCapture(0)
+        # Initialize camera (or a recorded frame store standing in for it)
+        if replay:
+            try:
+                self.cap = ReplayCapture(replay, realtime=replay_realtime)
+            except (IOError, ValueError):
+                # Reported like a missing camera
+                self.cap = cv2.VideoCapture()
+        else:
+            self.cap = cv2.VideoCapture(0)
+        if record_session:
+            self.cap = RecordingCapture(self.cap, record_session, capacity=session_frames, source=replay or 0)
         
         if not self.cap.isOpened():
             messagebox.showerror("Error", "Could not open camera")
             root.destroy()
             return
         
-        # Load age detection models
-        self.load_models()
+        # Load age detection models (age only, with this app's age groups)
+        self.analyzer = FaceAnalyzer(emotion_enabled=False, age_list=AGE_LIST, label_scale=0.8)
+        self.status_text = self.analyzer.status_text
+        
+        # Analysis only reads frames; overlays are drawn on the display-sized image and on saved captures
+        self.analyzer.annotate = False
+        self.renderer = OverlayRenderer(label_scale=0.8)
         
         # Age detection toggle
         self.age_detection_enabled = tk.BooleanVar(value=True)
@@ -29,30 +48,18 @@ class CameraApp:
         # Create GUI elements
         self.create_widgets()
         
+        # Captures are encoded and written on a background thread
+        self.writer = CaptureWriter("captures", renderer=self.renderer)
+        
+        # Reused capture buffer
+        self.read_buffer = None
+        
         # Start video feed
         self.update_frame()
         
         # Handle window closing
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
-    def load_models(self):
-        """Load pre-trained models for face and age detection"""
-        try:
-            # Age groups
-            self.age_list = ['(0-2)', '(4-6)', '(8-12)', '(15-20)', '(25-32)', '(38-43)', '(48-53)', '(60-100)']
-            
-            # Load face detection model (Haar Cascade)
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            
-            # For demonstration, we'll use a simple age estimation based on face characteristics
-            # In a production app, you would load pre-trained DNN models
-            self.model_loaded = True
-            self.status_text = "Models loaded successfully"
-            
-        except Exception as e:
-            self.model_loaded = False
-            self.status_text = f"Error loading models: {str(e)}"
-    
     def create_widgets(self):
         # Main frame
         main_frame = tk.Frame(self.root)
@@ -129,80 +136,22 @@ class CameraApp:
         self.status_label = tk.Label(main_frame, text=self.status_text, font=("Arial", 10))
         self.status_label.pack(pady=5)
     
-    def estimate_age_simple(self, face_roi):
-        """Simple age estimation based on face characteristics"""
-        # Convert to grayscale for analysis
-        gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
-        
-        # Calculate some basic features
-        height, width = gray_face.shape
-        
-        # Simple heuristic based on face smoothness and size
-        # This is a very basic estimation - real age detection uses complex neural networks
-        
-        # Calculate edge density (more edges might indicate older age due to wrinkles)
-        edges = cv2.Canny(gray_face, 50, 150)
-        edge_density = np.sum(edges) / (height * width)
-        
-        # Normalize edge density
-        edge_density_norm = min(edge_density / 50, 1.0)
-        
-        # Simple age estimation based on edge density and face size
-        if edge_density_norm < 0.1:
-            return self.age_list[0]  # (0-2)
-        elif edge_density_norm < 0.2:
-            return self.age_list[1]  # (4-6)
-        elif edge_density_norm < 0.3:
-            return self.age_list[2]  # (8-12)
-        elif edge_density_norm < 0.4:
-            return self.age_list[3]  # (15-20)
-        elif edge_density_norm < 0.5:
-            return self.age_list[4]  # (25-32)
-        elif edge_density_norm < 0.6:
-            return self.age_list[5]  # (38-43)
-        elif edge_density_norm < 0.7:
-            return self.age_list[6]  # (48-53)
-        else:
-            return self.age_list[7]  # (60-100)
-    
     def detect_faces_and_age(self, frame):
         """Detect faces and estimate ages"""
-        if not self.model_loaded or not self.age_detection_enabled.get():
+        if not self.age_detection_enabled.get():
             return frame, []
         
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-        
-        detection_results = []
-        
-        for (x, y, w, h) in faces:
-            # Draw rectangle around face
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-            
-            # Extract face ROI for age estimation
-            face_roi = frame[y:y+h, x:x+w]
-            
-            if face_roi.size > 0:
-                # Estimate age
-                estimated_age = self.estimate_age_simple(face_roi)
-                
-                # Draw age text
-                cv2.putText(frame, f'Age: {estimated_age}', (x, y-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-                
-                detection_results.append({
-                    'position': (x, y, w, h),
-                    'age': estimated_age
-                })
-        
-        return frame, detection_results
+        return self.analyzer.detect_faces_age_emotion(frame)
     
     def update_frame(self):
-        ret, frame = self.cap.read()
+        ret, frame = self.cap.read(self.read_buffer)
         
         if ret:
+            # Reuse the capture buffer next tick; analysis reads it without drawing on it
+            self.read_buffer = frame
+            
             # Apply face and age detection
-            processed_frame, detections = self.detect_faces_and_age(frame.copy())
+            _, detections = self.detect_faces_and_age(frame)
             
             # Update detection info
             if detections:
@@ -217,18 +166,22 @@ class CameraApp:
                     self.detection_info.config(text="Age detection disabled")
             
             # Convert frame from BGR to RGB
-            frame_rgb = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             
             # Resize frame to fit in window
             height, width = frame_rgb.shape[:2]
             max_width, max_height = 640, 480
             
+            scale = 1.0
             if width > max_width or height > max_height:
                 scale = min(max_width/width, max_height/height)
                 new_width = int(width * scale)
                 new_height = int(height * scale)
                 frame_rgb = cv2.resize(frame_rgb, (new_width, new_height))
             
+            # Draw boxes and labels at display size
+            self.renderer.draw(frame_rgb, detections, scale=scale, rgb=True)
+            
             # Convert to PIL Image and then to PhotoImage
             pil_image = Image.fromarray(frame_rgb)
             photo = ImageTk.PhotoImage(pil_image)
@@ -239,41 +192,35 @@ class CameraApp:
             
             # Store current frame for capture
             self.current_frame = frame
+            self.current_detections = detections
         
         # Schedule next frame update
         self.root.after(10, self.update_frame)
     
     def capture_photo(self):
         if hasattr(self, 'current_frame'):
-            # Create captures directory if it doesn't exist
-            if not os.path.exists("captures"):
-                os.makedirs("captures")
-            
-            # Apply detection to the captured frame
-            processed_frame, detections = self.detect_faces_and_age(self.current_frame.copy())
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"captures/photo_{timestamp}.jpg"
-            
-            # Save the photo with detections
-            cv2.imwrite(filename, processed_frame)
+            # Reuse this frame's detections; the writer thread draws them, then encodes and saves it
+            filename = self.writer.submit(self.current_frame.copy(), self.current_detections)
+            if filename is None:
+                self.status_label.config(text="Capture dropped: writer busy")
+                return
             
             # Create info text for the capture
-            if detections:
-                info_text = f"Captured photo with {len(detections)} face(s) detected"
+            if self.current_detections:
+                info_text = f"Captured photo with {len(self.current_detections)} face(s) detected"
             else:
                 info_text = "Photo captured (no faces detected)"
             
             # Update status
-            self.status_label.config(text=f"Photo saved: {filename}")
-            
-            # Show success message with detection info
-            messagebox.showinfo("Photo Captured", f"{info_text}\nSaved as: {filename}")
+            self.status_label.config(text=f"{info_text} - saving {filename}")
         else:
             messagebox.showerror("Error", "No frame available to capture")
     
     def on_closing(self):
+        # Finish pending photo writes
+        if hasattr(self, 'writer'):
+            self.writer.close()
+        
         # Release camera and close window
         if hasattr(self, 'cap'):
             self.cap.release()
@@ -281,6 +228,16 @@ class CameraApp:
 
 # Create and run the application
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Camera App with Age Detection")
+    parser.add_argument("--replay", help="play back a frame store (see framestore.py) instead of the camera")
+    parser.add_argument("--replay-fast", action="store_true",
+                        help="with --replay, deliver frames as fast as they are read instead of at recorded timing")
+    parser.add_argument("--record-session", help="save every raw camera frame to this frame store directory")
+    parser.add_argument("--session-frames", type=int, default=1800,
+                        help="frames preallocated for --record-session")
+    args = parser.parse_args()
+    
     root = tk.Tk()
-    app = CameraApp(root)
+    app = CameraApp(root, replay=args.replay, replay_realtime=not args.replay_fast,
+                    record_session=args.record_session, session_frames=args.session_frames)
     root.mainloop()
\ No newline at end of file
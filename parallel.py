@@ -0,0 +1,110 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Per-worker analyzer, created once by the pool initializer (processes) or
+# lazily per thread (threads) so cascades are never shared between workers
+_worker = {}
+_thread_state = threading.local()
+
+
+def _new_analyzer(options):
+    # Imported here so worker processes only pay for what they use; workers
+    # never detect faces, so they only load the eye/smile cascades, on first use
+    from face_analyzer import FaceAnalyzer
+    return FaceAnalyzer(preload=False, **options)
+
+
+def _init_process_worker(options, preloaded=None):
+    if preloaded is not None:
+        # Forked from the parent: reuse its already-loaded cascades (copy-on-write)
+        preloaded.executor = None
+        preloaded.cache = None
+        _worker['analyzer'] = preloaded
+    else:
+        _worker['analyzer'] = _new_analyzer(options)
+
+
+def _analyze_in_process(task):
+    face_roi, face_gray, age_enabled, emotion_enabled = task
+    return _analyze(_worker['analyzer'], face_roi, face_gray, age_enabled, emotion_enabled)
+
+
+def _analyze(analyzer, face_roi, face_gray, age_enabled, emotion_enabled):
+    if face_roi.size == 0:
+        return None, None
+    analyzer.age_enabled = age_enabled
+    analyzer.emotion_enabled = emotion_enabled
+    return analyzer.analyze_face(face_roi, face_gray)
+
+
+class FaceExecutor:
+    """Fan per-face age/emotion analysis out over a worker pool
+
+    kind='process' pickles each face crop to a process pool (sidesteps the
+    GIL entirely); kind='thread' keeps crops zero-copy and relies on OpenCV
+    releasing the GIL inside detectMultiScale/Canny. Each worker owns its
+    own cascades. Results always come back in the order the faces were
+    given. Frames with fewer than min_faces faces are cheaper to analyze
+    inline, so FaceAnalyzer skips the pool for them. analyzer_options are
+    passed to each worker's FaceAnalyzer (e.g. staged_emotion=True).
+
+    Where fork is already the platform's default start method, passing
+    preloaded (an analyzer whose models are already loaded) lets the
+    workers inherit its cascades instead of parsing the XML files again.
+    Fork is never forced: on other platforms, or with an explicit
+    start_method such as 'spawn' (which GUI processes should use, as
+    forking a process running Tk or Cocoa threads is unsafe), preloaded is
+    ignored and each worker loads its own models. Thread workers each need
+    their own cascades (detectMultiScale is not thread-safe) and load them
+    lazily.
+    """
+
+    def __init__(self, workers=None, kind='process', min_faces=2, age_list=None, analyzer_options=None,
+                 preloaded=None, start_method=None):
+        if kind not in ('process', 'thread'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.workers = workers or os.cpu_count() or 1
+        self.kind = kind
+        self.min_faces = min_faces
+        self.analyzer_options = dict(analyzer_options or {})
+        if age_list is not None:
+            self.analyzer_options['age_list'] = age_list
+
+        if kind == 'process':
+            # Forked workers inherit preloaded without pickling; other start methods load their own
+            if start_method is None:
+                start_method = (multiprocessing.get_start_method(allow_none=True)
+                                or multiprocessing.get_all_start_methods()[0])
+            if start_method != 'fork':
+                preloaded = None
+            context = multiprocessing.get_context(start_method)
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                            initializer=_init_process_worker,
+                                            initargs=(self.analyzer_options, preloaded))
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="face")
+
+    def _analyze_in_thread(self, task):
+        analyzer = getattr(_thread_state, 'analyzer', None)
+        if analyzer is None:
+            analyzer = _thread_state.analyzer = _new_analyzer(self.analyzer_options)
+        face_roi, face_gray, age_enabled, emotion_enabled = task
+        return _analyze(analyzer, face_roi, face_gray, age_enabled, emotion_enabled)
+
+    def analyze_faces(self, faces, age_enabled=True, emotion_enabled=True):
+        """Analyze a list of (face_roi, face_gray) pairs and return [(age, emotion), ...] in order"""
+        tasks = [(face_roi, face_gray, age_enabled, emotion_enabled) for face_roi, face_gray in faces]
+        if self.kind == 'process':
+            return list(self.pool.map(_analyze_in_process, tasks))
+        return list(self.pool.map(self._analyze_in_thread, tasks))
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from metrics import NULL_METRICS
+
+
+class LatestFrameGrabber:
+    """Capture thread that only ever holds the newest frame
+
+    Reading continuously keeps the camera's internal buffer drained, so a
+    slow consumer always sees the most recent frame instead of a backlog of
+    stale ones. Frames that are overwritten before anyone takes them are
+    counted as dropped.
+
+    For file sources, pace_fps reads at the file's frame rate (like a live
+    camera) and stop_at_end ends the thread at the last frame. on_frame is
+    called after every new frame, e.g. to wake a scheduler.
+    """
+
+    def __init__(self, cap, metrics=NULL_METRICS, pace_fps=None, stop_at_end=False, on_frame=None):
+        self.cap = cap
+        self.metrics = metrics
+        self.pace_fps = pace_fps
+        self.stop_at_end = stop_at_end
+        self.on_frame = on_frame
+        self.ended = False
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = 0.0
+        self.sequence = 0
+        self.taken_sequence = 0
+        self.dropped = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        next_read = time.perf_counter()
+        while self.running:
+            if self.pace_fps:
+                delay = next_read - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_read = max(next_read + 1.0 / self.pace_fps, time.perf_counter() - 1.0)
+            with self.metrics.stage('cap_read'):
+                ret, frame = self.cap.read()
+            if not ret:
+                if self.stop_at_end:
+                    self._end()
+                    break
+                time.sleep(0.005)
+                continue
+            timestamp = time.perf_counter()
+            with self.condition:
+                if self.sequence > self.taken_sequence:
+                    self.dropped += 1
+                self.frame = frame
+                self.timestamp = timestamp
+                self.sequence += 1
+                self.condition.notify_all()
+            if self.on_frame is not None:
+                self.on_frame()
+
+    def _end(self):
+        with self.condition:
+            self.ended = True
+            self.running = False
+            self.condition.notify_all()
+        if self.on_frame is not None:
+            self.on_frame()
+
+    def take(self, after_sequence, timeout=0.5):
+        """Wait for a frame newer than after_sequence and return (sequence, timestamp, frame)"""
+        with self.condition:
+            if self.sequence <= after_sequence:
+                self.condition.wait_for(lambda: self.sequence > after_sequence or not self.running, timeout)
+            if self.sequence <= after_sequence:
+                return None
+            self.taken_sequence = self.sequence
+            return self.sequence, self.timestamp, self.frame
+
+
+class LatencyStats:
+    """Rolling window of glass-to-glass latencies in seconds"""
+
+    def __init__(self, window=120):
+        self.samples = deque(maxlen=window)
+
+    def add(self, latency):
+        self.samples.append(latency)
+
+    def summary(self):
+        if not self.samples:
+            return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        values = np.array(self.samples) * 1000.0
+        return {
+            'count': len(values),
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+            'max_ms': float(values.max())
+        }
+
+
+class FramePipeline:
+    """Capture thread -> analysis worker -> latest result for the UI loop
+
+    analyze is called on the worker thread with a copy of each frame it
+    picks up (or the captured frame itself with copy=False, for analysis
+    that does not draw on it) and must return (processed_frame, detections). The UI polls
+    latest_result() and calls mark_displayed() once it has shown a result,
+    which records the glass-to-glass latency from capture to display.
+    A frame whose analysis raises is skipped and counted in stats() along
+    with the last error, and the worker carries on with the next frame.
+    """
+
+    def __init__(self, cap, analyze, latency_window=120, metrics=NULL_METRICS, copy=True):
+        self.grabber = LatestFrameGrabber(cap, metrics)
+        self.analyze = analyze
+        self.copy = copy
+        self.latency = LatencyStats(latency_window)
+        self.lock = threading.Lock()
+        self.result = None
+        self.analyzed = 0
+        self.errors = 0
+        self.last_error = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.grabber.start()
+        self.thread = threading.Thread(target=self._run, name="analysis", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.grabber.stop()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        sequence = 0
+        while self.running:
+            taken = self.grabber.take(sequence)
+            if taken is None:
+                continue
+            sequence, timestamp, frame = taken
+            try:
+                processed_frame, detections = self.analyze(frame.copy() if self.copy else frame)
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                continue
+            result = {
+                'sequence': sequence,
+                'captured_at': timestamp,
+                'analyzed_at': time.perf_counter(),
+                'frame': frame,
+                'processed_frame': processed_frame,
+                'detections': detections
+            }
+            with self.lock:
+                self.result = result
+                self.analyzed += 1
+
+    def latest_result(self, after_sequence=0):
+        """Return the newest finished result if it is newer than after_sequence"""
+        with self.lock:
+            result = self.result
+        if result is None or result['sequence'] <= after_sequence:
+            return None
+        return result
+
+    def mark_displayed(self, result):
+        self.latency.add(time.perf_counter() - result['captured_at'])
+
+    def stats(self):
+        stats = self.latency.summary()
+        stats['captured'] = self.grabber.sequence
+        stats['analyzed'] = self.analyzed
+        stats['dropped'] = self.grabber.dropped
+        stats['errors'] = self.errors
+        stats['last_error'] = self.last_error
+        return stats
@@ -0,0 +1,156 @@
+import json
+import time
+from collections import deque
+
+from detection import MultiResDetector
+
+# Quality ladder from full quality (level 0, the app's defaults) to cheapest.
+# downscale: detection resolution; scale_factor/min_size: face cascade search
+# (min_size in full-resolution pixels); reanalyze: multiplier on the
+# tracker's age/emotion re-evaluation interval. An analyzer that already has
+# a detector uses its settings as level 0 instead, and no level is allowed
+# to be more expensive than that.
+LEVELS = [
+    {'downscale': 1.0, 'scale_factor': 1.3, 'min_size': 0, 'reanalyze': 1},
+    {'downscale': 0.75, 'scale_factor': 1.3, 'min_size': 40, 'reanalyze': 1},
+    {'downscale': 0.5, 'scale_factor': 1.3, 'min_size': 48, 'reanalyze': 2},
+    {'downscale': 0.5, 'scale_factor': 1.4, 'min_size': 64, 'reanalyze': 2},
+    {'downscale': 0.35, 'scale_factor': 1.5, 'min_size': 80, 'reanalyze': 3},
+    {'downscale': 0.25, 'scale_factor': 1.6, 'min_size': 96, 'reanalyze': 4},
+]
+
+
+class QualityController:
+    """Trade detection quality for speed to hold a frame-time budget
+
+    Wraps the per-frame analyze step (same contract as
+    FaceAnalyzer.detect_faces_age_emotion) and keeps an exponentially
+    weighted average of its processing time. When the average stays above
+    the budget (1000 / target_fps ms, or target_latency_ms, whichever is
+    tighter) for `patience` frames it moves one level down the LEVELS
+    ladder; when it stays below headroom * budget for twice as long it
+    moves back up. After each change it waits `cooldown` frames for the
+    average to settle.
+
+    Resolution and the face cascade's scaleFactor/minSize are applied
+    through the analyzer's MultiResDetector (one doing full sweeps is
+    installed if the analyzer has none); the age/emotion interval through
+    the tracker, when one is given. The detector's own settings (e.g. from
+    --detect-scale) are the ceiling: they become level 0, and each lower
+    level is at least as cheap as them. Every decision is kept in `decisions`
+    and, with log_path, appended to a JSON lines file.
+    """
+
+    def __init__(self, analyzer, target_fps=None, target_latency_ms=None, analyze=None, tracker=None,
+                 levels=None, patience=5, cooldown=15, headroom=0.6, smoothing=0.2, log_path=None):
+        if not target_fps and not target_latency_ms:
+            raise ValueError("QualityController needs target_fps or target_latency_ms")
+        budgets = [1000.0 / target_fps] if target_fps else []
+        if target_latency_ms:
+            budgets.append(float(target_latency_ms))
+        self.budget_ms = min(budgets)
+
+        self.analyzer = analyzer
+        self.analyze = analyze or analyzer.detect_faces_age_emotion
+        self.tracker = tracker
+        self.levels = levels or LEVELS
+        self.patience = patience
+        self.cooldown = cooldown
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.log_path = log_path
+
+        if analyzer.detector is None:
+            first = self.levels[0]
+            analyzer.detector = MultiResDetector(downscale=first['downscale'], sweep_interval=1,
+                                                 scale_factor=first['scale_factor'], min_face_size=first['min_size'])
+        self.detector = analyzer.detector
+        self.base = {'downscale': self.detector.downscale, 'scale_factor': self.detector.scale_factor,
+                     'min_size': self.detector.min_face_size}
+        self.base_reanalyze = tracker.reanalyze_interval if tracker is not None else None
+
+        self.level = 0
+        self.frames = 0
+        self.average_ms = None
+        self.over = 0
+        self.under = 0
+        self.frames_since_change = 0
+        self.decisions = deque(maxlen=200)
+        self.apply(0, "start", 0.0)
+
+    def apply(self, level, reason, average_ms):
+        """Switch to a ladder level and record why"""
+        previous = self.level
+        self.level = level
+        settings = self.settings(level)
+        self.detector.downscale = settings['downscale']
+        self.detector.scale_factor = settings['scale_factor']
+        self.detector.min_face_size = settings['min_size']
+        self.detector.reset()
+        if self.tracker is not None:
+            self.tracker.reanalyze_interval = self.base_reanalyze * settings['reanalyze']
+
+        self.over = self.under = self.frames_since_change = 0
+        decision = {
+            'time': time.time(),
+            'frame': self.frames,
+            'from_level': previous,
+            'to_level': level,
+            'reason': reason,
+            'average_ms': round(average_ms, 2),
+            'budget_ms': round(self.budget_ms, 2),
+            'settings': dict(settings)
+        }
+        self.decisions.append(decision)
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(decision) + "\n")
+        return decision
+
+    def settings(self, level):
+        """Ladder level capped at the detector's original settings (level 0 is exactly those)"""
+        if level == 0:
+            return dict(self.base, reanalyze=1)
+        settings = self.levels[level]
+        return {
+            'downscale': min(settings['downscale'], self.base['downscale']),
+            'scale_factor': max(settings['scale_factor'], self.base['scale_factor']),
+            'min_size': max(settings['min_size'], self.base['min_size']),
+            'reanalyze': settings['reanalyze']
+        }
+
+    def observe(self, elapsed_ms):
+        """Feed one frame's processing time; may change the level"""
+        self.frames += 1
+        self.frames_since_change += 1
+        if self.average_ms is None:
+            self.average_ms = elapsed_ms
+        else:
+            self.average_ms += self.smoothing * (elapsed_ms - self.average_ms)
+        if self.frames_since_change < self.cooldown:
+            return None
+
+        if self.average_ms > self.budget_ms:
+            self.over += 1
+            self.under = 0
+        elif self.average_ms < self.budget_ms * self.headroom:
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = self.under = 0
+
+        if self.over >= self.patience and self.level < len(self.levels) - 1:
+            return self.apply(self.level + 1, "over budget", self.average_ms)
+        if self.under >= 2 * self.patience and self.level > 0:
+            return self.apply(self.level - 1, "headroom", self.average_ms)
+        return None
+
+    def update(self, frame):
+        start = time.perf_counter()
+        result = self.analyze(frame)
+        self.observe((time.perf_counter() - start) * 1000.0)
+        return result
+
+    def status(self):
+        average = self.average_ms or 0.0
+        return f"quality L{self.level} ({average:.0f}/{self.budget_ms:.0f} ms)"
@@ -0,0 +1,65 @@
+import cv2
+
+# Overlay colors (BGR) for emotion labels
+EMOTION_COLORS = {
+    'Happy': (0, 255, 0),      # Green
+    'Sad': (255, 0, 0),        # Blue
+    'Angry': (0, 0, 255),      # Red
+    'Surprise': (0, 255, 255), # Yellow
+    'Fear': (128, 0, 128),     # Purple
+    'Disgust': (0, 128, 128),  # Teal
+    'Neutral': (128, 128, 128) # Gray
+}
+
+BOX_COLOR = (255, 0, 0)    # Blue
+AGE_COLOR = (0, 255, 0)    # Green
+
+
+class OverlayRenderer:
+    """Draw detection records (face boxes plus age/emotion labels) onto an image
+
+    Analysis never draws on the frames it looks at; overlays are drawn from
+    the detection dicts afterwards, onto whatever image is being shown or
+    saved. scale maps full-resolution positions onto a resized image (the
+    display buffer), so boxes and text are drawn at the size they are seen
+    rather than drawn at full resolution and shrunk. Colors are BGR; pass
+    rgb=True for RGB/RGBA images.
+    """
+
+    def __init__(self, label_scale=0.7, colors=None, thickness=2):
+        self.label_scale = label_scale
+        self.colors = colors or EMOTION_COLORS
+        self.thickness = thickness
+
+    def emotion_color(self, emotion):
+        return self.colors.get(emotion, (255, 255, 255))
+
+    @staticmethod
+    def _color(color, image, rgb):
+        if rgb:
+            color = color[::-1]
+        if image.ndim == 3 and image.shape[2] == 4:
+            color = color + (255,)
+        return color
+
+    def draw_labels(self, image, x, y, estimated_age, estimated_emotion, rgb=False):
+        """Draw age/emotion labels stacked above a face at (x, y)"""
+        labels = []
+        if estimated_age:
+            labels.append((f'Age: {estimated_age}', AGE_COLOR))
+        if estimated_emotion:
+            labels.append((f'Emotion: {estimated_emotion}', self.emotion_color(estimated_emotion)))
+
+        y_offset = y - 10
+        for i, (label, color) in enumerate(labels):
+            cv2.putText(image, label, (x, y_offset - (i * 25)), cv2.FONT_HERSHEY_SIMPLEX, self.label_scale,
+                        self._color(color, image, rgb), self.thickness)
+
+    def draw(self, image, detections, scale=1.0, rgb=False):
+        """Draw every detection onto image, with positions multiplied by scale"""
+        box_color = self._color(BOX_COLOR, image, rgb)
+        for detection in detections:
+            x, y, w, h = (int(round(v * scale)) for v in detection['position'])
+            cv2.rectangle(image, (x, y), (x+w, y+h), box_color, self.thickness)
+            self.draw_labels(image, x, y, detection.get('age'), detection.get('emotion'), rgb)
+        return image
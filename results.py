@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import argparse
+import threading
+import time
+
+import numpy as np
+
+# One packed 32-byte row per detection
+DETECTION_DTYPE = np.dtype([
+    ('timestamp', np.float64),  # time.time() when the frame was analyzed
+    ('frame', np.int64),        # frame index / sequence within the source
+    ('source', np.uint16),      # index into the log's source names
+    ('track_id', np.int32),     # FaceTracker id, -1 when untracked
+    ('x', np.uint16),
+    ('y', np.uint16),
+    ('w', np.uint16),
+    ('h', np.uint16),
+    ('age', np.uint8),          # index into the log's age labels, NO_LABEL when not estimated
+    ('emotion', np.uint8),      # index into the log's emotion labels, NO_LABEL when not estimated
+])
+
+NO_LABEL = 255
+
+INDEX_FILE = "index.json"
+
+
+class ResultsSink:
+    """Buffered, append-only log of every detection in compact binary rows
+
+    add() packs a frame's detection dicts into a fixed-size DETECTION_DTYPE
+    buffer, so memory stays bounded however long the session runs. The
+    buffer is appended to the current segment file when it fills up or
+    flush_interval seconds have passed since the last write. Segments are
+    rotated at segment_bytes; with max_segments set the oldest ones are
+    deleted. Labels and source names are stored as small lookup tables in
+    index.json next to the segments; read_results() streams the log back.
+    """
+
+    def __init__(self, directory, flush_interval=1.0, buffer_records=4096, segment_bytes=64 * 1024 * 1024,
+                 max_segments=None, prefix="detections"):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.prefix = prefix
+
+        self.buffer = np.zeros(buffer_records, dtype=DETECTION_DTYPE)
+        self.count = 0
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.stats = {'records': 0, 'flushes': 0, 'bytes': 0, 'segments': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        index = read_index(directory) if os.path.isfile(os.path.join(directory, INDEX_FILE)) else None
+        if index is not None and index['dtype'] != DETECTION_DTYPE.descr:
+            raise IOError(f"{directory} holds a results log with a different record layout")
+        index = index or {'age_labels': [], 'emotion_labels': [], 'sources': [], 'segments': []}
+        self.age_labels = index['age_labels']
+        self.emotion_labels = index['emotion_labels']
+        self.sources = index['sources']
+        self.segments = index['segments']
+        self.index_dirty = index is None
+        self.next_segment = max((segment_number(name) for name in self.segments), default=0) + 1
+
+        # Always start a fresh segment, so an existing log is appended to rather than rewritten
+        self.file = None
+        self._rotate()
+
+    def _code(self, labels, label):
+        if label is None:
+            return NO_LABEL
+        try:
+            return labels.index(label)
+        except ValueError as e:
+            if len(labels) >= NO_LABEL:
+                raise ValueError(f"Too many distinct labels in results log (got {label!r})") from e
+            labels.append(label)
+            self.index_dirty = True
+            return len(labels) - 1
+
+    def source_code(self, source):
+        return self._code(self.sources, str(source))
+
+    def add(self, detections, frame=0, source=0, timestamp=None):
+        """Append one frame's detection dicts; flushes when the buffer is full or due"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            source_code = self.source_code(source)
+            for detection in detections:
+                if self.count == len(self.buffer):
+                    self._flush()
+                x, y, w, h = detection['position']
+                self.buffer[self.count] = (timestamp, frame, source_code, detection.get('track_id', -1),
+                                           x, y, w, h, self._code(self.age_labels, detection.get('age')),
+                                           self._code(self.emotion_labels, detection.get('emotion')))
+                self.count += 1
+            self.stats['records'] += len(detections)
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.count:
+            data = self.buffer[:self.count].tobytes()
+            self.file.write(data)
+            self.file.flush()
+            self.stats['bytes'] += len(data)
+            self.stats['flushes'] += 1
+            self.count = 0
+            if self.file.tell() >= self.segment_bytes:
+                self._rotate()
+        if self.index_dirty:
+            self._write_index()
+        self.last_flush = time.monotonic()
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+        self.stats['segments'] += 1
+        # Numbered on from the log's existing segments; "xb" never reuses a file already on disk
+        while True:
+            name = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{self.next_segment:05d}.bin"
+            self.next_segment += 1
+            try:
+                self.file = open(os.path.join(self.directory, name), "xb")
+                break
+            except FileExistsError:
+                continue
+        self.segments.append(name)
+
+        # Bounded disk use: drop the oldest segments
+        while self.max_segments and len(self.segments) > self.max_segments:
+            old = self.segments.pop(0)
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+        self._write_index()
+
+    def _write_index(self):
+        index = {
+            'dtype': DETECTION_DTYPE.descr,
+            'age_labels': self.age_labels,
+            'emotion_labels': self.emotion_labels,
+            'sources': self.sources,
+            'segments': self.segments
+        }
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(path + ".tmp", path)
+        self.index_dirty = False
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.file.close()
+
+
+def segment_number(name):
+    """Sequence number at the end of a segment file name (0 if it has none)"""
+    stem = os.path.splitext(name)[0]
+    suffix = stem.rsplit("_", 1)[-1]
+    return int(suffix) if suffix.isdigit() else 0
+
+
+def read_index(directory):
+    with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as f:
+        index = json.load(f)
+    index['dtype'] = [tuple(field) for field in index['dtype']]
+    return index
+
+
+def read_results(directory, chunk_records=65536):
+    """Stream a results log back as DETECTION_DTYPE arrays of up to chunk_records rows"""
+    index = read_index(directory)
+    dtype = np.dtype(index['dtype'])
+    for name in index['segments']:
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        # Ignore a trailing partial row left by an interrupted write
+        remaining = os.path.getsize(path) // dtype.itemsize
+        with open(path, "rb") as f:
+            while remaining > 0:
+                count = min(chunk_records, remaining)
+                chunk = np.fromfile(f, dtype=dtype, count=count)
+                if len(chunk) == 0:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+def iter_detections(directory):
+    """Stream a results log back as detection dicts with decoded labels"""
+    index = read_index(directory)
+    ages, emotions, sources = index['age_labels'], index['emotion_labels'], index['sources']
+    for chunk in read_results(directory):
+        for row in chunk:
+            yield {
+                'timestamp': float(row['timestamp']),
+                'frame': int(row['frame']),
+                'source': sources[row['source']] if row['source'] < len(sources) else None,
+                'track_id': int(row['track_id']) if row['track_id'] >= 0 else None,
+                'position': (int(row['x']), int(row['y']), int(row['w']), int(row['h'])),
+                'age': ages[row['age']] if row['age'] != NO_LABEL else None,
+                'emotion': emotions[row['emotion']] if row['emotion'] != NO_LABEL else None
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a detection results log back as JSON lines")
+    parser.add_argument("directory", help="results log directory (holds index.json)")
+    parser.add_argument("--summary", action="store_true", help="print per-source/label counts instead")
+    args = parser.parse_args(argv)
+
+    try:
+        index = read_index(args.directory)
+    except (IOError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    if not args.summary:
+        for detection in iter_detections(args.directory):
+            sys.stdout.write(json.dumps(detection) + "\n")
+        return 0
+
+    # Counts straight from the columns, without decoding every row
+    total = 0
+    counts = {'source': {}, 'age': {}, 'emotion': {}}
+    labels = {'source': index['sources'], 'age': index['age_labels'], 'emotion': index['emotion_labels']}
+    for chunk in read_results(args.directory):
+        total += len(chunk)
+        for field, table in counts.items():
+            codes, hits = np.unique(chunk[field], return_counts=True)
+            for code, hit in zip(codes, hits):
+                name = labels[field][code] if code < len(labels[field]) else "-"
+                table[name] = table.get(name, 0) + int(hit)
+    print(json.dumps({'detections': total, 'counts': counts}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import http.client
+import socket
+import socketserver
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+from pipeline import LatencyStats
+
+# Largest request body accepted (an encoded image)
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+
+class ServerBusy(Exception):
+    """Raised when the request queue is full"""
+
+
+class BatchingAnalyzer:
+    """Micro-batch analysis requests onto a pool of warm analyzer threads
+
+    submit() queues a decoded frame and returns a Future. A batcher thread
+    hands requests to the workers as soon as one of them is free, together
+    with whatever else is already pending (up to max_batch), so an idle
+    pool never holds a request back. Batches only grow while every worker
+    is busy: requests arriving meanwhile wait in the pending queue and go
+    out as one batch when a worker frees up. The cascades and heuristics
+    work one frame at a time, so a batch is not run as one unit; its
+    requests are spread over the workers, each free worker taking the
+    next frame. Every worker owns an analyzer built by analyzer_factory up
+    front, with its models already loaded (cascades are not thread-safe,
+    so they are never shared). OpenCV releases the GIL while it works, so
+    the workers run in parallel. Workers call the read-only analyze(), so
+    no overlay is drawn.
+
+    At most max_pending requests wait at a time; submit() raises
+    ServerBusy beyond that rather than letting latency grow unbounded.
+    """
+
+    def __init__(self, analyzer_factory, workers=2, max_batch=8, max_pending=64):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.work = queue.Queue()
+        self.running = True
+        self.lock = threading.Lock()
+
+        # Requests handed to the workers and not finished yet; below `workers` means one is free
+        self.outstanding = 0
+        self.worker_free = threading.Condition(self.lock)
+        self.latency = LatencyStats(1000)
+        self.stats = {'requests': 0, 'batches': 0, 'rejected': 0, 'errors': 0, 'faces': 0}
+
+        # Load every worker's models before accepting requests
+        self.analyzers = [analyzer_factory() for _ in range(workers)]
+        self.threads = [threading.Thread(target=self._batcher, name="batcher", daemon=True)]
+        for index, analyzer in enumerate(self.analyzers):
+            self.threads.append(threading.Thread(target=self._worker, args=(analyzer,),
+                                                 name=f"analyzer-{index}", daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, frame):
+        future = Future()
+        try:
+            self.pending.put_nowait((time.perf_counter(), frame, future))
+        except queue.Full as e:
+            with self.lock:
+                self.stats['rejected'] += 1
+            raise ServerBusy("Too many pending requests") from e
+        return future
+
+    def _batcher(self):
+        while self.running:
+            try:
+                batch = [self.pending.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            with self.worker_free:
+                # Requests keep arriving in pending while every worker is busy
+                while self.outstanding >= self.workers and self.running:
+                    self.worker_free.wait(0.1)
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self.pending.get_nowait())
+                    except queue.Empty:
+                        break
+                self.outstanding += len(batch)
+                self.stats['batches'] += 1
+            for queued_at, frame, future in batch:
+                self.work.put((queued_at, frame, future, len(batch)))
+
+    def _worker(self, analyzer):
+        while self.running:
+            try:
+                queued_at, frame, future, batch_size = self.work.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                detections = analyzer.analyze(frame)
+            except Exception as e:
+                with self.worker_free:
+                    self.stats['errors'] += 1
+                    self.outstanding -= 1
+                    self.worker_free.notify()
+                future.set_exception(e)
+                continue
+            with self.worker_free:
+                self.latency.add(time.perf_counter() - queued_at)
+                self.stats['requests'] += 1
+                self.stats['faces'] += len(detections)
+                self.outstanding -= 1
+                self.worker_free.notify()
+            future.set_result({'detections': detections, 'batch_size': batch_size})
+
+    def summary(self):
+        with self.lock:
+            summary = dict(self.stats)
+            summary['latency'] = self.latency.summary()
+        summary['mean_batch'] = summary['requests'] / summary['batches'] if summary['batches'] else 0.0
+        summary['pending'] = self.pending.qsize()
+        return summary
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+
+def make_handler(batcher, timeout=30.0):
+    """HTTP/1.1 request handler class bound to a BatchingAnalyzer"""
+
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps connections open between requests unless the client closes them
+        protocol_version = "HTTP/1.1"
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path in ("/health", "/stats"):
+                self.send_json(200, batcher.summary())
+            else:
+                self.send_json(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                # The body can't be skipped without its length, so the connection can't be reused
+                self.close_connection = True
+                self.send_json(400, {'error': "Invalid Content-Length"})
+                return
+            if self.path != "/analyze":
+                # Nothing here wants the body, so the connection is closed rather than reading it
+                self.close_connection = True
+                self.send_json(404, {'error': f"Unknown path {self.path}"})
+                return
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self.close_connection = True
+                self.send_json(413 if length > 0 else 411, {'error': "Body must be one JPEG/PNG image"})
+                return
+
+            start = time.perf_counter()
+            data = np.frombuffer(self.rfile.read(length), dtype=np.uint8)
+            frame = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            if frame is None:
+                self.send_json(400, {'error': "Could not decode image (expected JPEG or PNG)"})
+                return
+            try:
+                result = batcher.submit(frame).result(timeout=timeout)
+            except ServerBusy as e:
+                self.send_json(503, {'error': str(e)})
+                return
+            except Exception as e:
+                self.send_json(500, {'error': str(e)})
+                return
+
+            height, width = frame.shape[:2]
+            self.send_json(200, {
+                'width': width,
+                'height': height,
+                'detections': result['detections'],
+                'batch_size': result['batch_size'],
+                'elapsed_ms': (time.perf_counter() - start) * 1000.0
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix domain socket, one thread per connection"""
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """http.client connection over a Unix domain socket (for clients of --unix)"""
+
+    def __init__(self, path, timeout=30.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def connect(address, timeout=30.0):
+    """Keep-alive client connection to a server URL (http://host:port) or Unix socket path"""
+    if address.startswith("http://"):
+        url = urlparse(address)
+        return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    return UnixHTTPConnection(address, timeout=timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve face, age and emotion detection over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="TCP port to listen on")
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="analyzer threads")
+    parser.add_argument("--max-batch", type=int, default=8,
+                        help="most requests handed out together once a worker frees up")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="requests allowed to wait before new ones get 503")
+    parser.add_argument("--no-age", action="store_true", help="disable age estimation")
+    parser.add_argument("--no-emotion", action="store_true", help="disable emotion detection")
+    parser.add_argument("--staged-emotion", action="store_true",
+                        help="evaluate emotion rules lazily, searching eyes/smiles in half-face regions")
+    parser.add_argument("--backend", choices=("haar", "dnn"), default="haar",
+                        help="haar cascades and heuristics, or cv2.dnn models from --models-dir")
+    parser.add_argument("--models-dir", default="models", help="directory holding the DNN model files")
+    args = parser.parse_args(argv)
+
+    from face_analyzer import FaceAnalyzer
+    from backends import load_dnn_backend
+
+    def analyzer_factory():
+        # cv2.dnn nets are not thread-safe either, so each worker loads its own
+        backend = load_dnn_backend(args.models_dir) if args.backend == "dnn" else None
+        analyzer = FaceAnalyzer(age_enabled=not args.no_age, emotion_enabled=not args.no_emotion,
+                                staged_emotion=args.staged_emotion, backend=backend)
+        if not analyzer.model_loaded and analyzer.model_error:
+            raise IOError(analyzer.status_text)
+        return analyzer
+
+    try:
+        batcher = BatchingAnalyzer(analyzer_factory, workers=args.workers,
+                                   max_batch=args.max_batch, max_pending=args.max_pending)
+    except (IOError, cv2.error) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    handler = make_handler(batcher)
+    if args.unix:
+        server = ThreadingUnixHTTPServer(args.unix, handler)
+        where = f"unix:{args.unix}"
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        where = f"http://{args.host}:{server.server_address[1]}"
+    print(f"Serving on {where} with {args.workers} workers (POST /analyze, GET /stats)", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+        summary = batcher.summary()
+        print(f"Served {summary['requests']} requests in {summary['batches']} batches "
+              f"({summary['mean_batch']:.1f} per batch), {summary['rejected']} rejected", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from metrics import NULL_METRICS
+from pipeline import LatencyStats
+
+# Slots of the int64 control block at the start of the shared header
+LATEST, LATEST_SLOT, TAKEN, WRITTEN, DROPPED, RUNNING, AGE, EMOTION = range(8)
+CONTROL_FIELDS = 8
+
+# Frames start on a cache-line boundary after the header
+ALIGNMENT = 64
+
+
+class SharedFrameRing:
+    """Fixed-size ring of frame slots in shared memory, with sequence numbers
+
+    One shared_memory block holds a small header followed by `slots`
+    frames of a fixed shape. The capture side copies each frame into a
+    free slot with write() and publishes it under the next sequence number;
+    analysis processes take() the newest published frame as a numpy view
+    straight into the block, so nothing is pickled or copied on the way.
+    Like LatestFrameGrabber, only the newest frame is handed out: frames
+    overwritten before any reader took them are counted as dropped, and
+    each frame goes to exactly one reader.
+
+    A slot that has been taken is never written until release(slot) is
+    called, so a reader's view stays valid while it works. If every slot
+    is taken, write() drops the frame rather than waiting. Frames whose
+    shape differs from the ring's are dropped as well. write() is
+    reserve(), a copy into frames[slot] and commit(); callers that must
+    record something about the slot before readers can see it use the
+    two halves directly.
+
+    The ring pickles to its block name and lock, so it can be passed to a
+    multiprocessing.Process; the child attaches to the same memory. Only
+    the creating process may unlink() it.
+    """
+
+    def __init__(self, shape, slots=4, dtype=np.uint8, context=None, name=None, condition=None):
+        if slots < 2:
+            raise ValueError("A frame ring needs at least two slots")
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+        if self.owner:
+            context = context or multiprocessing.get_context()
+            condition = context.Condition()
+            self.shm = shared_memory.SharedMemory(create=True, size=self._size())
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.condition = condition
+        self._map()
+        if self.owner:
+            self.control[:] = 0
+            self.sequences[:] = 0
+            self.readers[:] = 0
+            self.control[RUNNING] = 1
+            self.control[AGE] = 1
+            self.control[EMOTION] = 1
+
+    def _header_bytes(self):
+        header = (CONTROL_FIELDS + 3 * self.slots) * 8
+        return (header + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    def _size(self):
+        return self._header_bytes() + self.slots * int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def _map(self):
+        buffer = self.shm.buf
+        self.control = np.ndarray((CONTROL_FIELDS,), dtype=np.int64, buffer=buffer)
+        offset = CONTROL_FIELDS * 8
+        self.sequences = np.ndarray((self.slots,), dtype=np.int64, buffer=buffer, offset=offset)
+        self.readers = np.ndarray((self.slots,), dtype=np.int64, buffer=buffer, offset=offset + self.slots * 8)
+        self.timestamps = np.ndarray((self.slots,), dtype=np.float64, buffer=buffer,
+                                     offset=offset + 2 * self.slots * 8)
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype, buffer=buffer,
+                                 offset=self._header_bytes())
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'shape': self.shape, 'slots': self.slots, 'dtype': self.dtype.str,
+                'condition': self.condition}
+
+    def __setstate__(self, state):
+        self.__init__(state['shape'], slots=state['slots'], dtype=state['dtype'], name=state['name'],
+                      condition=state['condition'])
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def running(self):
+        return bool(self.control[RUNNING])
+
+    def write(self, frame, timestamp=None):
+        """Copy frame into a free slot and publish it; returns (sequence, slot), or None if it was dropped"""
+        slot = self.reserve(frame.shape)
+        if slot is None:
+            return None
+        np.copyto(self.frames[slot], frame)
+        return self.commit(slot, timestamp), slot
+
+    def reserve(self, shape):
+        """Claim a free slot for writing and return its index, or None (counted as dropped)"""
+        if tuple(shape) != self.shape:
+            with self.condition:
+                self.control[DROPPED] += 1
+            return None
+
+        # Oldest slot nobody is reading that isn't the current newest frame; 0 marks it unpublished
+        with self.condition:
+            latest_slot = self.control[LATEST_SLOT] if self.control[LATEST] else -1
+            free = [slot for slot in range(self.slots) if self.readers[slot] == 0 and slot != latest_slot]
+            if not free:
+                self.control[DROPPED] += 1
+                return None
+            slot = min(free, key=lambda s: self.sequences[s])
+            self.sequences[slot] = 0
+            return slot
+
+    def commit(self, slot, timestamp=None):
+        """Publish a reserved slot, once frames[slot] holds the frame; returns its sequence number"""
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        with self.condition:
+            if self.control[LATEST] > self.control[TAKEN]:
+                self.control[DROPPED] += 1
+            sequence = int(self.control[WRITTEN]) + 1
+            self.sequences[slot] = sequence
+            self.timestamps[slot] = timestamp
+            self.control[WRITTEN] = sequence
+            self.control[LATEST] = sequence
+            self.control[LATEST_SLOT] = slot
+            self.condition.notify_all()
+        return sequence
+
+    def take(self, timeout=0.5):
+        """Wait for a frame no reader has taken and return (sequence, timestamp, slot, view)
+
+        The view points into shared memory; call release(slot) when done with it.
+        Returns None on timeout or once the ring is stopped.
+        """
+        with self.condition:
+            ready = lambda: self.control[LATEST] > self.control[TAKEN] or not self.control[RUNNING]
+            if not ready():
+                self.condition.wait_for(ready, timeout)
+            if not self.control[RUNNING] or self.control[LATEST] <= self.control[TAKEN]:
+                return None
+            slot = int(self.control[LATEST_SLOT])
+            self.readers[slot] += 1
+            self.control[TAKEN] = self.control[LATEST]
+            return int(self.sequences[slot]), float(self.timestamps[slot]), slot, self.frames[slot]
+
+    def release(self, slot):
+        with self.condition:
+            self.readers[slot] -= 1
+
+    def set_toggles(self, age_enabled, emotion_enabled):
+        """Age/emotion switches read by the analysis processes before each frame"""
+        self.control[AGE] = int(age_enabled)
+        self.control[EMOTION] = int(emotion_enabled)
+
+    def toggles(self):
+        return bool(self.control[AGE]), bool(self.control[EMOTION])
+
+    def stats(self):
+        with self.condition:
+            return {'written': int(self.control[WRITTEN]), 'dropped': int(self.control[DROPPED])}
+
+    def stop(self):
+        with self.condition:
+            self.control[RUNNING] = 0
+            self.condition.notify_all()
+
+    def close(self):
+        """Detach from the block; views returned by take() must not be touched afterwards"""
+        self.control = self.sequences = self.readers = self.timestamps = self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+
+
+def _analysis_worker(ring, results, analyzer_options, detector_options):
+    # Imported here so the spawned process only loads what analysis needs
+    from face_analyzer import FaceAnalyzer
+    from detection import MultiResDetector
+
+    detector = MultiResDetector(**detector_options) if detector_options else None
+    analyzer = FaceAnalyzer(detector=detector, **analyzer_options)
+    analyzer.annotate = False
+    results.put(('ready', os.getpid()))
+    try:
+        while ring.running:
+            taken = ring.take()
+            if taken is None:
+                continue
+            sequence, timestamp, slot, frame = taken
+            analyzer.age_enabled, analyzer.emotion_enabled = ring.toggles()
+            try:
+                detections = analyzer.analyze(frame)
+            except Exception as e:
+                results.put(('error', slot, sequence, f"{type(e).__name__}: {e}"))
+                continue
+            # The slot is released by the parent once it has picked up the result
+            results.put(('result', slot, sequence, timestamp, time.perf_counter(), detections))
+    finally:
+        ring.close()
+
+
+class SharedFramePipeline:
+    """Capture thread -> shared-memory frame ring -> analysis processes
+
+    Drop-in for FramePipeline (start/stop, latest_result, mark_displayed,
+    stats) that runs analysis in `workers` separate processes, so the face
+    cascades no longer compete with the UI for the GIL. The capture thread
+    owns cap: it copies each frame into a SharedFrameRing and keeps its own
+    reference to the frame for display. Workers read frames as views into
+    the ring and send back only the detection list, which a collector
+    thread pairs with the kept frame before releasing the slot.
+
+    The ring is created from the first frame's shape, then the workers are
+    started. They are spawned rather than forked (forking a Tk process is
+    unsafe) and each loads its own FaceAnalyzer from analyzer_options,
+    plus a MultiResDetector from detector_options if given. Frames captured
+    before a worker is ready are counted as dropped. Results can arrive
+    out of order; only a result newer than the last one replaces it.
+    """
+
+    def __init__(self, cap, workers=2, analyzer_options=None, detector_options=None, slots=None,
+                 latency_window=120, metrics=NULL_METRICS, start_method='spawn'):
+        self.cap = cap
+        self.workers = workers
+        self.analyzer_options = dict(analyzer_options or {})
+        self.detector_options = detector_options
+        self.slots = slots or 2 * workers + 2
+        self.metrics = metrics
+        self.context = multiprocessing.get_context(start_method)
+        self.results = self.context.Queue()
+        self.latency = LatencyStats(latency_window)
+        self.lock = threading.Lock()
+        self.ring = None
+        self.ring_ready = threading.Event()
+        self.slot_frames = [None] * self.slots
+        self.toggles = (True, True)
+        self.processes = []
+        self.result = None
+        self.captured = 0
+        self.analyzed = 0
+        self.errors = 0
+        self.last_error = None
+        self.ready = 0
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        self.threads = [threading.Thread(target=self._capture, name="capture", daemon=True),
+                        threading.Thread(target=self._collect, name="results", daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def _start_workers(self, shape, dtype):
+        self.ring = SharedFrameRing(shape, slots=self.slots, dtype=dtype, context=self.context)
+        self.ring.set_toggles(*self.toggles)
+        for index in range(self.workers):
+            process = self.context.Process(target=_analysis_worker, name=f"analysis-{index}", daemon=True,
+                                           args=(self.ring, self.results, self.analyzer_options,
+                                                 self.detector_options))
+            process.start()
+            self.processes.append(process)
+        self.ring_ready.set()
+
+    def _capture(self):
+        while self.running:
+            with self.metrics.stage('cap_read'):
+                ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.005)
+                continue
+            if self.ring is None:
+                self._start_workers(frame.shape, frame.dtype)
+            self.captured += 1
+            slot = self.ring.reserve(frame.shape)
+            if slot is None:
+                continue
+            # Pair the frame with its slot before any worker can take it; the slot can't be rewritten
+            # until its result is collected, so the pairing holds until then
+            np.copyto(self.ring.frames[slot], frame)
+            self.slot_frames[slot] = frame
+            self.ring.commit(slot)
+
+    def _collect(self):
+        while self.running:
+            try:
+                message = self.results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == 'ready':
+                self.ready += 1
+                continue
+            slot, sequence = message[1], message[2]
+            frame = self.slot_frames[slot]
+            self.ring.release(slot)
+            if kind == 'error':
+                self.errors += 1
+                self.last_error = message[3]
+                continue
+            captured_at, analyzed_at, detections = message[3], message[4], message[5]
+            result = {
+                'sequence': sequence,
+                'captured_at': captured_at,
+                'analyzed_at': analyzed_at,
+                'frame': frame,
+                'processed_frame': frame,
+                'detections': detections
+            }
+            with self.lock:
+                self.analyzed += 1
+                if self.result is None or sequence > self.result['sequence']:
+                    self.result = result
+
+    def set_toggles(self, age_enabled, emotion_enabled):
+        self.toggles = (age_enabled, emotion_enabled)
+        if self.ring is not None:
+            self.ring.set_toggles(age_enabled, emotion_enabled)
+
+    def latest_result(self, after_sequence=0):
+        """Return the newest finished result if it is newer than after_sequence"""
+        with self.lock:
+            result = self.result
+        if result is None or result['sequence'] <= after_sequence:
+            return None
+        return result
+
+    def mark_displayed(self, result):
+        self.latency.add(time.perf_counter() - result['captured_at'])
+
+    def stats(self):
+        stats = self.latency.summary()
+        ring = self.ring.stats() if self.ring is not None else {'written': 0, 'dropped': 0}
+        stats['captured'] = self.captured
+        stats['analyzed'] = self.analyzed
+        stats['dropped'] = ring['dropped']
+        stats['errors'] = self.errors
+        stats['last_error'] = self.last_error
+        stats['workers_ready'] = self.ready
+        return stats
+
+    def stop(self):
+        self.running = False
+        if self.ring is not None:
+            self.ring.stop()
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.results.close()
+        if self.ring is not None:
+            # A capture thread stuck in cap.read() may still write to the ring, so only detach once it is gone
+            self.slot_frames = [None] * self.slots
+            if not any(thread.is_alive() for thread in self.threads):
+                self.ring.close()
+            self.ring.unlink()
@@ -0,0 +1,211 @@
+from collections import Counter, deque
+
+import cv2
+import numpy as np
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class Track:
+    """One face followed across frames, with its recent age/emotion estimates"""
+
+    def __init__(self, track_id, box, history):
+        self.track_id = track_id
+        self.box = box
+        self.points = None
+        self.quality = 1.0
+        self.misses = 0
+        self.frames_since_analysis = None
+        self.ages = deque(maxlen=history)
+        self.emotions = deque(maxlen=history)
+
+    def add_estimate(self, age, emotion):
+        if age is not None:
+            self.ages.append(age)
+        if emotion is not None:
+            self.emotions.append(emotion)
+        self.frames_since_analysis = 0
+
+    def age(self):
+        """Most common recent age estimate (smooths frame-to-frame flicker)"""
+        return Counter(self.ages).most_common(1)[0][0] if self.ages else None
+
+    def emotion(self):
+        """Most common recent emotion estimate"""
+        return Counter(self.emotions).most_common(1)[0][0] if self.emotions else None
+
+
+class FaceTracker:
+    """Follow faces between periodic full detections
+
+    The face cascade only runs every detect_interval frames, or sooner when
+    optical-flow tracking quality (fraction of feature points still tracked)
+    drops below min_quality. In between, each track's box is moved by the
+    median Lucas-Kanade flow of feature points inside it. New detections are
+    matched to existing tracks by IoU so IDs stay stable, and age/emotion
+    are only re-estimated every reanalyze_interval frames per track, with
+    the displayed label being the majority vote over the last few estimates.
+    A track that missed the latest detection is kept for up to max_misses
+    detections, so a face the cascade briefly loses keeps its ID, but it is
+    not reported (or drawn, or re-analyzed) until a detection matches it
+    again; a face that has left the frame leaves no ghost box behind.
+
+    update() has the same contract as FaceAnalyzer.detect_faces_age_emotion
+    and adds a 'track_id' to every detection.
+    """
+
+    def __init__(self, analyzer, detect_interval=10, reanalyze_interval=15, min_quality=0.5,
+                 iou_threshold=0.3, max_misses=2, history=7):
+        self.analyzer = analyzer
+        self.detect_interval = detect_interval
+        self.reanalyze_interval = reanalyze_interval
+        self.min_quality = min_quality
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.history = history
+
+        self.tracks = []
+        self.next_id = 1
+        self.prev_gray = None
+        self.gray_slot = 0
+        self.frames_since_detection = 0
+        self.stats = {'frames': 0, 'detections': 0, 'analyses': 0}
+
+    def reset(self):
+        self.tracks = []
+        self.prev_gray = None
+
+    def _seed_points(self, gray, track):
+        x, y, w, h = track.box
+        mask = self.analyzer.buffers.get('track_mask', gray.shape)
+        mask.fill(0)
+        mask[y:y+h, x:x+w] = 255
+        track.points = cv2.goodFeaturesToTrack(gray, maxCorners=30, qualityLevel=0.01,
+                                               minDistance=5, mask=mask)
+        track.quality = 1.0
+
+    def _follow(self, gray):
+        """Move every track by optical flow; return the lowest tracking quality"""
+        height, width = gray.shape
+        lowest = 1.0
+        for track in self.tracks:
+            if track.points is None or len(track.points) == 0:
+                track.quality = 0.0
+                lowest = 0.0
+                continue
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, track.points, None)
+            good = status.reshape(-1) == 1
+            track.quality = float(good.mean())
+            lowest = min(lowest, track.quality)
+            if not good.any():
+                continue
+            dx, dy = np.median((new_points[good] - track.points[good]).reshape(-1, 2), axis=0)
+            x, y, w, h = track.box
+            x = int(np.clip(round(x + dx), 0, max(0, width - w)))
+            y = int(np.clip(round(y + dy), 0, max(0, height - h)))
+            track.box = (x, y, w, h)
+            track.points = new_points[good].reshape(-1, 1, 2)
+        return lowest
+
+    def _match(self, gray, boxes):
+        """Greedy IoU matching of fresh detections onto existing tracks"""
+        pairs = sorted(((box_iou(track.box, box), t, d)
+                        for t, track in enumerate(self.tracks)
+                        for d, box in enumerate(boxes)), reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        for iou, t, d in pairs:
+            if iou < self.iou_threshold or t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+            self.tracks[t].box = boxes[d]
+            self.tracks[t].misses = 0
+
+        survivors = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        for d, box in enumerate(boxes):
+            if d not in matched_boxes:
+                survivors.append(Track(self.next_id, box, self.history))
+                self.next_id += 1
+
+        self.tracks = survivors
+        for track in self.tracks:
+            self._seed_points(gray, track)
+
+    def update(self, frame):
+        """Track faces in frame, refresh stale estimates and draw them onto frame"""
+        analyzer = self.analyzer
+        if not analyzer.model_loaded:
+            return frame, []
+
+        self.stats['frames'] += 1
+        # Two grayscale buffers used in turn: optical flow needs this frame's and the previous one
+        self.gray_slot ^= 1
+        with analyzer.metrics.stage('grayscale'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY,
+                                dst=analyzer.buffers.get(f'track_gray_{self.gray_slot}', frame.shape[:2]))
+
+        # Follow existing tracks; fall back to a full detection when it gets shaky
+        need_detection = (self.prev_gray is None or self.prev_gray.shape != gray.shape
+                          or self.frames_since_detection >= self.detect_interval - 1)
+        if not need_detection and self.tracks:
+            need_detection = self._follow(gray) < self.min_quality
+
+        if need_detection:
+            faces = analyzer.detect_faces(gray, frame)
+            self._match(gray, [tuple(int(v) for v in face) for face in faces])
+            self.frames_since_detection = 0
+            self.stats['detections'] += 1
+        else:
+            self.frames_since_detection += 1
+        self.prev_gray = gray
+
+        # Re-estimate age/emotion for new or stale tracks only, in one batch (before any drawing); this goes
+        # through the analyzer's face cache and worker pool like full-frame analysis
+        visible = [track for track in self.tracks if track.misses == 0]
+        stale = []
+        for track in visible:
+            if (track.frames_since_analysis is None
+                    or track.frames_since_analysis >= self.reanalyze_interval
+                    or (analyzer.age_enabled and not track.ages)
+                    or (analyzer.emotion_enabled and not track.emotions)):
+                stale.append(track)
+            else:
+                track.frames_since_analysis += 1
+        if stale:
+            estimates = analyzer.estimate(frame, gray, [track.box for track in stale])
+            for track, (estimated_age, estimated_emotion) in zip(stale, estimates):
+                track.add_estimate(estimated_age, estimated_emotion)
+            self.stats['analyses'] += len(stale)
+
+        detection_results = []
+        for track in visible:
+            x, y, w, h = track.box
+            estimated_age = track.age() if analyzer.age_enabled else None
+            estimated_emotion = track.emotion() if analyzer.emotion_enabled else None
+            detection_results.append({
+                'position': (x, y, w, h),
+                'age': estimated_age,
+                'emotion': estimated_emotion,
+                'track_id': track.track_id
+            })
+
+        if analyzer.annotate:
+            with analyzer.metrics.stage('overlay'):
+                analyzer.renderer.draw(frame, detection_results)
+        return frame, detection_results